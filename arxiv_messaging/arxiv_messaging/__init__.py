@@ -13,8 +13,7 @@ from .event_type import (
     UserPreference, 
     Event
 )
-from .send_notification import send_notification
-from .firebase_loader import FirebaseLoader
+from .send_notification import send_notification, send_bulk_notification, publish_bulk_notification
 
 __version__ = "0.1.0"
 __all__ = [
@@ -27,5 +26,15 @@ __all__ = [
     "UserPreference", 
     "Event",
     "send_notification", 
+    "send_bulk_notification",
+    "publish_bulk_notification",
     "FirebaseLoader"
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    # FirebaseLoader pulls in firebase_admin and Firestore, so load it only when it is used
+    if name == "FirebaseLoader":
+        from .firebase_loader import FirebaseLoader
+        return FirebaseLoader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
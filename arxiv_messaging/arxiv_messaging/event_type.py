@@ -29,7 +29,7 @@ class DeliveryErrorStrategy(Enum):
     RETRY = "retry"      # Retry on delivery failure (guaranteed delivery)
     IGNORE = "ignore"    # Ignore delivery failures (avoid spam/duplicates)
 
-@dataclass
+@dataclass(slots=True)
 class Subscription:
     subscription_id: str  # Unique identifier for this subscription
     user_id: str          # User who owns this subscription
@@ -47,7 +47,7 @@ class Subscription:
 # Backward compatibility alias
 UserPreference = Subscription
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     event_id: str
     user_id: str
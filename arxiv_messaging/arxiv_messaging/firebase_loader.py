@@ -2,22 +2,148 @@
 Firebase/Firestore data loader and unloader using YAML configuration
 """
 
+import asyncio
+import json
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from functools import cached_property
+from typing import List, Dict, Any, AsyncIterator, Tuple
 from ruamel.yaml import YAML
 import structlog
+from google.api_core.retry import Retry
 from firebase_admin import credentials, firestore, initialize_app
 import firebase_admin
 from .event_type import EventType, UserPreference, Subscription, DeliveryMethod, AggregationFrequency, AggregationMethod, DeliveryErrorStrategy
 
 logger = structlog.get_logger(__name__)
 
+# Enum value -> member lookups, avoiding an Enum() constructor call per record
+_DELIVERY_METHODS = DeliveryMethod._value2member_map_
+_AGGREGATION_FREQUENCIES = AggregationFrequency._value2member_map_
+_AGGREGATION_METHODS = AggregationMethod._value2member_map_
+_DELIVERY_ERROR_STRATEGIES = DeliveryErrorStrategy._value2member_map_
+
+# Defaults for optional subscriber fields
+_SUBSCRIBER_DEFAULTS = {
+    'email_address': None,
+    'delivery_error_strategy': 'retry',
+    'delivery_time': '09:00',
+    'timezone': 'UTC',
+    'slack_webhook_url': None,
+    'enabled': True
+}
+
+# Enum-valued subscriber fields and their accepted values
+_ENUM_FIELDS = (
+    ('delivery_method', _DELIVERY_METHODS),
+    ('aggregation_frequency', _AGGREGATION_FREQUENCIES),
+    ('aggregation_method', _AGGREGATION_METHODS),
+    ('delivery_error_strategy', _DELIVERY_ERROR_STRATEGIES)
+)
+
+# Fields stored in each Firestore subscription document
+_SUBSCRIPTION_FIELDS = (
+    'subscription_id', 'user_id', 'email_address', 'delivery_method',
+    'aggregation_frequency', 'aggregation_method', 'delivery_error_strategy',
+    'delivery_time', 'timezone', 'slack_webhook_url', 'enabled'
+)
+
+def _normalize_for_firestore(subscriber_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Validate YAML subscriber data and build its Firestore document in one pass
+    
+    Returns:
+        Tuple of (subscription_id, document data)
+    """
+    data = {**_SUBSCRIBER_DEFAULTS, **subscriber_data}
+    for field, accepted in _ENUM_FIELDS:
+        if data[field] not in accepted:
+            raise ValueError(f"Invalid {field}: {data[field]!r}")
+    
+    # Generate subscription_id if not provided, treating an explicit null as missing like yaml_to_subscription
+    if data.get('subscription_id') is None:
+        data['subscription_id'] = f"{data['user_id']}-{data['delivery_method']}"
+    
+    return data['subscription_id'], {field: data[field] for field in _SUBSCRIPTION_FIELDS}
+
+# Firestore clients shared by all loaders, keyed by (project_id, database_id)
+_CLIENTS: Dict[Tuple[str, str], Any] = {}
+
+# Set to opt in to caching the Firestore access token on disk between CLI invocations
+TOKEN_CACHE_ENV = 'ARXIV_MESSAGING_TOKEN_CACHE'
+_TOKEN_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'arxiv-messaging', 'token.json')
+
+def _get_cached_credentials():
+    """Return default credentials primed with an access token cached by a previous run"""
+    import google.auth
+    from google.auth.transport.requests import Request
+    from google.cloud.firestore import Client
+    
+    creds, _ = google.auth.default(scopes=Client.SCOPE)
+    
+    # Reuse the cached token if it is valid for at least another minute
+    try:
+        with open(_TOKEN_CACHE_PATH, 'r') as file:
+            cached = json.load(file)
+        expiry = datetime.fromisoformat(cached['expiry'])
+        if expiry > datetime.utcnow() + timedelta(seconds=60):
+            creds.token = cached['token']
+            creds.expiry = expiry
+            return creds
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    creds.refresh(Request())
+    try:
+        os.makedirs(os.path.dirname(_TOKEN_CACHE_PATH), exist_ok=True)
+        fd = os.open(_TOKEN_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as file:
+            json.dump({'token': creds.token, 'expiry': creds.expiry.isoformat()}, file)
+    except OSError as e:
+        logger.warning("Failed to write token cache", file=_TOKEN_CACHE_PATH, error=str(e))
+    return creds
+
+def _get_firestore_client(project_id: str, database_id: str):
+    """Return a cached Firestore client, creating it on first use"""
+    key = (project_id, database_id)
+    if key in _CLIENTS:
+        return _CLIENTS[key]
+    
+    if os.getenv(TOKEN_CACHE_ENV):
+        from google.cloud.firestore import Client
+        client = Client(project=project_id, database=database_id, credentials=_get_cached_credentials())
+    else:
+        # Initialize Firebase if not already done
+        if not firebase_admin._apps:
+            # Use default credentials (from environment or service account)
+            cred = credentials.ApplicationDefault()
+            initialize_app(cred, {'projectId': project_id})
+        
+        if database_id != "(default)":
+            # For non-default databases, we need to create a custom client
+            from google.cloud.firestore import Client
+            client = Client(project=project_id, database=database_id)
+        else:
+            client = firestore.client()
+    
+    _CLIENTS[key] = client
+    return client
+
 class FirebaseLoader:
     """Load/unload user preferences to/from Firestore using YAML configuration"""
     
+    # Firestore collection holding subscriptions
+    COLLECTION = 'subscriptions'
+    # Number of documents per write batch; small batches are committed in parallel
+    BATCH_SIZE = 50
+    # Number of write batches committed concurrently
+    MAX_WORKERS = 20
+    
     def __init__(self, project_id: str, yaml_file: str = "subscribers.yaml", database_id: str = "messaging"):
         """
-        Initialize Firebase connection
+        Initialize loader; the Firestore connection is opened on first use
         
         Args:
             project_id: GCP project ID
@@ -27,25 +153,19 @@ class FirebaseLoader:
         self.project_id = project_id
         self.yaml_file = yaml_file
         self.database_id = database_id
-        self.yaml = YAML()
-        self.yaml.preserve_quotes = True
+        # Safe loader/dumper uses the libyaml C extension when available.
+        # Saved data is rebuilt from Firestore, so there are no comments to round-trip.
+        self.yaml = YAML(typ='safe')
+        self.yaml.default_flow_style = False
+        self.yaml.sort_base_mapping_type_on_output = False
         
-        # Initialize Firebase if not already done
-        if not firebase_admin._apps:
-            # Use default credentials (from environment or service account)
-            cred = credentials.ApplicationDefault()
-            initialize_app(cred, {'projectId': project_id})
-        
-        # Create client and get database reference
-        client = firestore.client()
-        if database_id != "(default)":
-            # For non-default databases, we need to create a custom client
-            from google.cloud.firestore import Client
-            self.db = Client(database=database_id)
-        else:
-            self.db = client
         logger.info("Firebase loader initialized", project_id=project_id, database_id=database_id, yaml_file=yaml_file)
     
+    @cached_property
+    def db(self):
+        """Firestore client, connected lazily on first access"""
+        return _get_firestore_client(self.project_id, self.database_id)
+    
     def load_yaml(self) -> List[Dict[str, Any]]:
         """Load subscribers from YAML file"""
         try:
@@ -65,7 +185,8 @@ class FirebaseLoader:
         """Save subscribers to YAML file"""
         try:
             data = {'subscribers': subscribers}
-            with open(self.yaml_file, 'w') as file:
+            # Buffer output so the emitter's many small writes hit the file in large blocks
+            with open(self.yaml_file, 'wb', buffering=1 << 20) as file:
                 self.yaml.dump(data, file)
             logger.info("Saved subscribers to YAML", count=len(subscribers))
         except Exception as e:
@@ -74,24 +195,27 @@ class FirebaseLoader:
     
     def yaml_to_subscription(self, subscriber_data: Dict[str, Any]) -> Subscription:
         """Convert YAML subscriber data to Subscription object"""
-        user_id = subscriber_data['user_id']
-        delivery_method = subscriber_data['delivery_method']
+        data = {**_SUBSCRIBER_DEFAULTS, **subscriber_data}
+        user_id = data['user_id']
+        delivery_method = data['delivery_method']
         
-        # Generate subscription_id if not provided
-        subscription_id = subscriber_data.get('subscription_id', f"{user_id}-{delivery_method}")
+        # Generate subscription_id only if not provided
+        subscription_id = data.get('subscription_id')
+        if subscription_id is None:
+            subscription_id = f"{user_id}-{delivery_method}"
         
         return Subscription(
             subscription_id=subscription_id,
             user_id=user_id,
-            email_address=subscriber_data.get('email_address'),
-            delivery_method=DeliveryMethod(delivery_method),
-            aggregation_frequency=AggregationFrequency(subscriber_data['aggregation_frequency']),
-            aggregation_method=AggregationMethod(subscriber_data['aggregation_method']),
-            delivery_error_strategy=DeliveryErrorStrategy(subscriber_data.get('delivery_error_strategy', 'retry')),
-            delivery_time=subscriber_data.get('delivery_time', '09:00'),
-            timezone=subscriber_data.get('timezone', 'UTC'),
-            slack_webhook_url=subscriber_data.get('slack_webhook_url'),
-            enabled=subscriber_data.get('enabled', True)
+            email_address=data['email_address'],
+            delivery_method=_DELIVERY_METHODS[delivery_method],
+            aggregation_frequency=_AGGREGATION_FREQUENCIES[data['aggregation_frequency']],
+            aggregation_method=_AGGREGATION_METHODS[data['aggregation_method']],
+            delivery_error_strategy=_DELIVERY_ERROR_STRATEGIES[data['delivery_error_strategy']],
+            delivery_time=data['delivery_time'],
+            timezone=data['timezone'],
+            slack_webhook_url=data['slack_webhook_url'],
+            enabled=data['enabled']
         )
 
     # Backward compatibility method
@@ -120,6 +244,39 @@ class FirebaseLoader:
         """Convert UserPreference object to YAML-compatible dict (backward compatibility)"""
         return self.subscription_to_yaml(pref)
     
+    def _commit_batch(self, collection_ref, documents: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Write a chunk of (subscription_id, data) documents to Firestore in a single batch
+        
+        Returns:
+            Number of documents written (0 if the commit failed)
+        """
+        batch = self.db.batch()
+        for subscription_id, data in documents:
+            batch.set(collection_ref.document(subscription_id), data)
+        
+        try:
+            batch.commit(retry=Retry())
+            logger.info("Committed subscription batch to Firestore", batch_size=len(documents))
+            return len(documents)
+        except Exception as e:
+            logger.error("Failed to commit subscription batch", 
+                       batch_size=len(documents), 
+                       error=str(e))
+            return 0
+    
+    def _build_documents(self, subscribers: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Validate and convert each subscriber straight to its Firestore document, skipping invalid ones"""
+        documents = []
+        for subscriber_data in subscribers:
+            try:
+                documents.append(_normalize_for_firestore(subscriber_data))
+            except Exception as e:
+                logger.error("Failed to load subscriber", 
+                           subscriber=subscriber_data.get('user_id', 'unknown'), 
+                           error=str(e))
+        return documents
+    
     def load_to_firestore(self) -> int:
         """
         Load subscribers from YAML file to Firestore
@@ -132,100 +289,143 @@ class FirebaseLoader:
             logger.warning("No subscribers to load")
             return 0
         
-        loaded_count = 0
-        collection_ref = self.db.collection('subscriptions')
+        documents = self._build_documents(subscribers)
+        collection_ref = self.db.collection(self.COLLECTION)
+        remaining = iter(documents)
+        chunks = iter(lambda: list(islice(remaining, self.BATCH_SIZE)), [])
         
-        for subscriber_data in subscribers:
-            try:
-                # Convert to Subscription to validate data
-                subscription = self.yaml_to_subscription(subscriber_data)
-                
-                # Store in new subscriptions collection
-                doc_ref = collection_ref.document(subscription.subscription_id)
-                doc_ref.set(self.subscription_to_yaml(subscription))
-                
-                loaded_count += 1
-                logger.info("Loaded subscription to Firestore", 
-                           subscription_id=subscription.subscription_id,
-                           user_id=subscription.user_id, 
-                           delivery_method=subscription.delivery_method.value)
-                
-            except Exception as e:
-                logger.error("Failed to load subscriber", 
-                           subscriber=subscriber_data.get('user_id', 'unknown'), 
-                           error=str(e))
+        # Commit batches concurrently; the Firestore client is thread-safe
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            loaded_count = sum(executor.map(lambda chunk: self._commit_batch(collection_ref, chunk), chunks))
         
         logger.info("Firestore load completed", loaded=loaded_count, total=len(subscribers))
         return loaded_count
     
-    def unload_from_firestore(self, save_to_yaml: bool = True) -> List[UserPreference]:
+    async def _iter_docs(self, client, page_size: int = 500) -> AsyncIterator[Any]:
+        """Stream documents one keyset-paginated page at a time to bound memory use"""
+        from google.cloud.firestore_v1.field_path import FieldPath
+        query = client.collection(self.COLLECTION).order_by(FieldPath.document_id()).limit(page_size)
+        cursor = None
+        
+        while True:
+            page = query.start_after(cursor) if cursor is not None else query
+            page_count = 0
+            async for doc in page.stream():
+                page_count += 1
+                cursor = doc
+                yield doc
+            
+            if page_count < page_size:
+                break
+    
+    async def _stream_subscriptions(self) -> AsyncIterator[Subscription]:
+        """Parse subscription documents as they are streamed by the async Firestore client"""
+        # Async client is bound to the running event loop, so it is not cached
+        from google.cloud.firestore import AsyncClient
+        # Honour the opt-in token cache here too, as _get_firestore_client does for the sync client
+        credentials = _get_cached_credentials() if os.getenv(TOKEN_CACHE_ENV) else None
+        client = AsyncClient(project=self.project_id, database=self.database_id, credentials=credentials)
+        
+        try:
+            async for doc in self._iter_docs(client):
+                try:
+                    subscription = self.yaml_to_subscription(doc.to_dict())
+                except Exception as e:
+                    logger.error("Failed to parse Firestore document", 
+                               doc_id=doc.id, 
+                               error=str(e))
+                    continue
+                
+                logger.debug("Unloaded subscription from Firestore", 
+                            subscription_id=subscription.subscription_id,
+                            user_id=subscription.user_id)
+                yield subscription
+        finally:
+            # close() only releases the HTTP transport; the gRPC channel is closed on this loop
+            client.close()
+            await client._firestore_api.transport.close()
+    
+    async def _unload_async(self) -> List[Subscription]:
+        """Collect all subscriptions, overlapping page fetches with parsing"""
+        return [subscription async for subscription in self._stream_subscriptions()]
+    
+    def unload_from_firestore(self, save_to_yaml: bool = True) -> List[Subscription]:
         """
-        Unload all user preferences from Firestore
+        Unload all subscriptions from Firestore
         
         Args:
             save_to_yaml: Whether to save the data to YAML file
             
         Returns:
-            List of UserPreference objects
+            List of Subscription objects
         """
-        collection_ref = self.db.collection('user_preferences')
-        docs = collection_ref.stream()
-        
-        preferences = []
-        for doc in docs:
-            try:
-                data = doc.to_dict()
-                user_pref = self.yaml_to_user_preference(data)
-                preferences.append(user_pref)
-                
-                logger.info("Unloaded subscriber from Firestore", 
-                           user_id=user_pref.user_id,
-                           delivery_method=user_pref.delivery_method.value)
-                
-            except Exception as e:
-                logger.error("Failed to parse Firestore document", 
-                           doc_id=doc.id, 
-                           error=str(e))
+        subscriptions = asyncio.run(self._unload_async())
         
-        if save_to_yaml and preferences:
+        if save_to_yaml and subscriptions:
             # Convert to YAML format and save
-            yaml_data = [self.user_preference_to_yaml(pref) for pref in preferences]
+            yaml_data = [self.subscription_to_yaml(sub) for sub in subscriptions]
             self.save_yaml(yaml_data)
         
-        logger.info("Firestore unload completed", unloaded=len(preferences))
-        return preferences
+        logger.info("Firestore unload completed", unloaded=len(subscriptions))
+        return subscriptions
     
     def clear_firestore(self) -> int:
         """
-        Clear all user preferences from Firestore
+        Clear all subscriptions from Firestore
         
         Returns:
             Number of documents deleted
         """
-        collection_ref = self.db.collection('user_preferences')
-        docs = collection_ref.stream()
+        collection_ref = self.db.collection(self.COLLECTION)
+        # Only document references are needed, so list keys without reading fields
+        doc_refs = collection_ref.list_documents(page_size=1000)
         
-        deleted_count = 0
-        for doc in docs:
-            doc.reference.delete()
-            deleted_count += 1
-            logger.info("Deleted subscriber from Firestore", user_id=doc.id)
+        # BulkWriter batches, parallelizes and retries the deletes; results arrive on its worker threads
+        bulk_writer = self.db.bulk_writer()
+        deleted_ids = []
+        bulk_writer.on_write_result(lambda reference, result, writer: deleted_ids.append(reference.id))
+        for doc_ref in doc_refs:
+            bulk_writer.delete(doc_ref)
+        
+        # Flush pending deletes and shut down the writer
+        bulk_writer.close()
+        deleted_count = len(deleted_ids)
         
         logger.info("Firestore clear completed", deleted=deleted_count)
         return deleted_count
     
     def sync_yaml_to_firestore(self) -> Dict[str, int]:
         """
-        Sync YAML file to Firestore (clear existing and load from YAML)
+        Sync YAML file to Firestore
+        
+        Subscriptions missing from the YAML file are deleted and every YAML
+        subscription is written, in a single BulkWriter pass.
         
         Returns:
             Dictionary with 'deleted' and 'loaded' counts
         """
         logger.info("Starting YAML to Firestore sync")
         
-        deleted_count = self.clear_firestore()
-        loaded_count = self.load_to_firestore()
+        documents = self._build_documents(self.load_yaml())
+        collection_ref = self.db.collection(self.COLLECTION)
+        
+        # Diff document IDs so only subscriptions removed from the YAML are deleted
+        existing_ids = {doc_ref.id for doc_ref in collection_ref.list_documents(page_size=1000)}
+        removed_ids = existing_ids - {subscription_id for subscription_id, _ in documents}
+        
+        # Record each successful write as BulkWriter reports it from its worker threads
+        bulk_writer = self.db.bulk_writer()
+        written_ids = []
+        bulk_writer.on_write_result(lambda reference, result, writer: written_ids.append(reference.id))
+        for subscription_id in removed_ids:
+            bulk_writer.delete(collection_ref.document(subscription_id))
+        for subscription_id, data in documents:
+            bulk_writer.set(collection_ref.document(subscription_id), data)
+        
+        # Flush pending writes and shut down the writer
+        bulk_writer.close()
         
-        result = {'deleted': deleted_count, 'loaded': loaded_count}
+        deleted_count = sum(1 for subscription_id in written_ids if subscription_id in removed_ids)
+        result = {'deleted': deleted_count, 'loaded': len(written_ids) - deleted_count}
         logger.info("YAML to Firestore sync completed", **result)
-        return result
\ No newline at end of file
+        return result
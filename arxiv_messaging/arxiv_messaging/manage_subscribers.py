@@ -6,24 +6,35 @@ Command-line tool to manage subscribers in Firebase using YAML configuration
 import argparse
 import os
 import sys
-import json
-from datetime import datetime
+import orjson
 import structlog
 from arxiv_messaging.firebase_loader import FirebaseLoader
 
+# Column headings and row format for the `list` command; precision specifiers truncate long values
+LIST_HEADER = (
+    f"{'Subscription ID':20} {'User ID':15} {'Delivery':15} {'Frequency':10} "
+    f"{'Method':8} {'Strategy':8} {'Details':20}"
+)
+LIST_ROW_TEMPLATE = (
+    "  {enabled} {subscription_id:18.18} {user_id:13} {delivery_method:13} "
+    "{aggregation_frequency:8} {aggregation_method:6} {delivery_error_strategy:6.6} {email_address:.18}"
+)
+
+def _orjson_dumps(obj, **kwargs) -> str:
+    """JSON serializer for structlog backed by orjson"""
+    return orjson.dumps(obj, **kwargs).decode('utf-8')
+
 def setup_logging():
     """Configure structured logging"""
     structlog.configure(
         processors=[
             structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
             structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.StackInfoRenderer(),
             structlog.processors.format_exc_info,
             structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
+            structlog.processors.JSONRenderer(serializer=_orjson_dumps)
         ],
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
@@ -31,7 +42,6 @@ def setup_logging():
     )
 
 def main():
-    import os, sys
     setup_logging()
     logger = structlog.get_logger(__name__)
     
@@ -60,7 +70,7 @@ def main():
     clear_parser = subparsers.add_parser('clear', help='Clear all subscribers from Firestore')
     
     # Sync command
-    sync_parser = subparsers.add_parser('sync', help='Sync YAML file to Firestore (clear + load)')
+    sync_parser = subparsers.add_parser('sync', help='Sync YAML file to Firestore (delete removed + load)')
     
     # List command
     list_parser = subparsers.add_parser('list', help='List subscribers from YAML file')
@@ -114,21 +124,23 @@ def main():
             if not subscribers:
                 print("No subscribers found in YAML file")
             else:
-                print(f"Found {len(subscribers)} subscriptions in {args.yaml_file}:")
-                print()
-                print(f"{'Subscription ID':20} {'User ID':15} {'Delivery':15} {'Frequency':10} {'Method':8} {'Strategy':8} {'Details':20}")
-                print("-" * 100)
-                
-                for sub in subscribers:
-                    subscription_id = sub.get('subscription_id', f"{sub['user_id']}-{sub['delivery_method']}")
-                    delivery_info = ""
-                    if sub.get('email_address'):
-                        delivery_info = sub['email_address'][:18]
-                    
-                    enabled_status = "✓" if sub.get('enabled', True) else "✗"
-                    error_strategy = sub.get('delivery_error_strategy', 'retry')[:6]
-                    
-                    print(f"  {enabled_status} {subscription_id[:18]:18} {sub['user_id']:13} {sub['delivery_method']:13} {sub['aggregation_frequency']:8} {sub['aggregation_method']:6} {error_strategy:6} {delivery_info}")
+                header = [
+                    f"Found {len(subscribers)} subscriptions in {args.yaml_file}:",
+                    "",
+                    LIST_HEADER,
+                    "-" * 100
+                ]
+                rows = [
+                    LIST_ROW_TEMPLATE.format_map({
+                        **sub,
+                        'enabled': "✓" if sub.get('enabled', True) else "✗",
+                        'subscription_id': sub.get('subscription_id', f"{sub['user_id']}-{sub['delivery_method']}"),
+                        'delivery_error_strategy': sub.get('delivery_error_strategy', 'retry'),
+                        'email_address': sub.get('email_address') or ""
+                    })
+                    for sub in subscribers
+                ]
+                sys.stdout.write("\n".join(header + rows) + "\n")
         
         elif args.command == 'undelivered':
             if not args.undelivered_command:
@@ -137,10 +149,7 @@ def main():
             
             # Create EventStore instance to access undelivered messages
             try:
-                # Import here to avoid circular imports and path issues
-                import sys
-                import os
-                
+                # Messaging service components are imported here so other commands skip their import cost
                 # Add messaging-service to path
                 messaging_service_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'messaging-service', 'src')
                 if messaging_service_path not in sys.path:
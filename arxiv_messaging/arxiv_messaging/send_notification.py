@@ -2,38 +2,101 @@
 Send notification messages to the arXiv messaging service via Pub/Sub
 """
 
-import json
+import atexit
+import concurrent.futures
+import functools
 import os
 import sys
-import requests
 from datetime import datetime
-from typing import Dict, Any, Optional, Union, List
-from google.cloud import pubsub_v1
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request
+from typing import TYPE_CHECKING, Dict, Any, Optional, Union, List, Tuple
+import orjson
 from .event_type import EventType
 
+# The Google client libraries take a few hundred milliseconds to import, so they are
+# loaded on first publish rather than whenever the package is imported
+if TYPE_CHECKING:
+    import requests
+    from google.api_core.retry import Retry
+    from google.cloud import pubsub_v1
+    from google.oauth2 import service_account
+
+
+# Messages published close together are coalesced into a few publish RPCs, each kept
+# under Pub/Sub's 10MB request limit rather than the client's 1MB default
+PUBLISHER_BATCH_SETTINGS = {'max_messages': 1000, 'max_bytes': 9_000_000, 'max_latency': 0.01}
+
+# Publish limits for a single REST API request
+REST_PUBLISH_MAX_MESSAGES = 1000
+REST_PUBLISH_MAX_BYTES = 9_000_000
+
+
+@functools.lru_cache(maxsize=None)
+def _publish_retry() -> 'Retry':
+    """Retry transient publish failures with short backoff, giving up well before the client's ten-minute default"""
+    from google.api_core import exceptions as core_exceptions
+    from google.api_core.retry import Retry, if_exception_type
+
+    return Retry(
+        predicate=if_exception_type(
+            core_exceptions.Aborted,
+            core_exceptions.DeadlineExceeded,
+            core_exceptions.InternalServerError,
+            core_exceptions.ResourceExhausted,
+            core_exceptions.ServiceUnavailable,
+        ),
+        initial=0.1,
+        maximum=2.0,
+        multiplier=2.0,
+        timeout=30.0
+    )
 
 
+def _encode_event(event_data: Dict[str, Any]) -> bytes:
+    """Serialize an event to the JSON bytes published to Pub/Sub"""
+    # Metadata may use non-string keys, which the standard json module also accepted
+    return orjson.dumps(event_data, option=orjson.OPT_NON_STR_KEYS)
 
-def _get_access_token(credentials_path: str) -> str:
-    """Get access token using service account credentials"""
-    credentials = service_account.Credentials.from_service_account_file(
+
+@functools.lru_cache(maxsize=4)
+def _load_credentials(credentials_path: str) -> 'service_account.Credentials':
+    """Load service account credentials with the Pub/Sub scope, parsing each key file once"""
+    from google.oauth2 import service_account
+
+    return service_account.Credentials.from_service_account_file(
         credentials_path,
         scopes=['https://www.googleapis.com/auth/pubsub']
     )
-    credentials.refresh(Request())
+
+
+def _get_access_token(credentials_path: str) -> str:
+    """Get access token using service account credentials"""
+    from google.auth.transport.requests import Request
+
+    credentials = _load_credentials(credentials_path)
+    # The cached token is reused until it is close to expiry
+    if not credentials.valid:
+        credentials.refresh(Request())
     return credentials.token
 
 
-def _send_via_rest_api(
+@functools.lru_cache(maxsize=None)
+def _get_rest_session() -> 'requests.Session':
+    """Get the session used for REST API publishes, keeping its connection to Pub/Sub open"""
+    import requests
+
+    return requests.Session()
+
+
+def _send_bulk_via_rest_api(
         project_id: str,
         topic_name: str,
-        message_data: str,
+        messages: List[bytes],
         credentials_path: str,
         logger=None
-) -> str:
-    """Send message via REST API as fallback"""
+) -> List[str]:
+    """Send messages via REST API as fallback, publishing as many per request as Pub/Sub allows"""
+    import base64
+
     try:
         # Get access token
         access_token = _get_access_token(credentials_path)
@@ -45,28 +108,31 @@ def _send_via_rest_api(
             'Content-Type': 'application/json'
         }
 
-        # Prepare message payload
-        import base64
-        encoded_data = base64.b64encode(message_data.encode('utf-8')).decode('utf-8')
-        payload = {
-            'messages': [
-                {
-                    'data': encoded_data
-                }
-            ]
-        }
-
-        # Make the request
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-
-        result = response.json()
-        message_id = result.get('messageIds', [None])[0]
+        # Group the encoded messages into requests within the publish limits
+        batches = [[]]
+        batch_bytes = 0
+        for message_data in messages:
+            encoded_data = base64.b64encode(message_data).decode('ascii')
+            if batches[-1] and (len(batches[-1]) == REST_PUBLISH_MAX_MESSAGES
+                                or batch_bytes + len(encoded_data) > REST_PUBLISH_MAX_BYTES):
+                batches.append([])
+                batch_bytes = 0
+            batches[-1].append({'data': encoded_data})
+            batch_bytes += len(encoded_data)
+
+        message_ids = []
+        for batch in batches:
+            response = _get_rest_session().post(url, headers=headers, json={'messages': batch})
+            response.raise_for_status()
+            # A response without IDs yields None for each message, as the single-message fallback always did
+            batch_ids = response.json().get('messageIds') or []
+            message_ids.extend(batch_ids + [None] * (len(batch) - len(batch_ids)))
 
         if logger:
-            logger.info("Message published via REST API", extra={"message_id": message_id})
+            logger.info("Messages published via REST API",
+                        extra={"count": len(message_ids), "requests": len(batches)})
 
-        return message_id
+        return message_ids
 
     except Exception as e:
         if logger:
@@ -74,6 +140,88 @@ def _send_via_rest_api(
         raise
 
 
+def _send_via_rest_api(
+        project_id: str,
+        topic_name: str,
+        message_data: bytes,
+        credentials_path: str,
+        logger=None
+) -> str:
+    """Send message via REST API as fallback"""
+    return _send_bulk_via_rest_api(project_id, topic_name, [message_data], credentials_path, logger)[0]
+
+
+def _create_publisher() -> 'pubsub_v1.PublisherClient':
+    """Create a Pub/Sub publisher client, using explicit credentials when configured"""
+    from google.cloud import pubsub_v1
+
+    batch_settings = pubsub_v1.types.BatchSettings(**PUBLISHER_BATCH_SETTINGS)
+    credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+    if credentials_path and os.path.exists(credentials_path):
+        credentials = _load_credentials(credentials_path)
+        return pubsub_v1.PublisherClient(credentials=credentials, batch_settings=batch_settings)
+    return pubsub_v1.PublisherClient(batch_settings=batch_settings)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_publisher(project_id: str, topic_name: str) -> Tuple['pubsub_v1.PublisherClient', str]:
+    """Get a publisher client and topic path, reusing its channel and credentials across calls"""
+    publisher = _create_publisher()
+    # Flush any messages still waiting in a batch when the interpreter exits
+    atexit.register(publisher.stop)
+    return publisher, publisher.topic_path(project_id, topic_name)
+
+
+def _build_event(
+        subject: str,
+        message: str,
+        user_id: Optional[Union[str, List[str]]] = None,
+        email_to: Optional[str] = None,
+        sender: str = "no-reply@arxiv.org",
+        event_type: Union[EventType, str] = EventType.NOTIFICATION,
+        metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Build the event payload published to the messaging service"""
+    # Validate that either user_id or email_to is provided
+    if not user_id and not email_to:
+        raise Exception("Either user_id or email_to must be provided")
+
+    # Default metadata
+    if metadata is None:
+        metadata = {}
+
+    # Generate unique event ID
+    if user_id:
+        if isinstance(user_id, list):
+            identifier = f"multi-{len(user_id)}-users"
+        else:
+            identifier = user_id
+    else:
+        identifier = email_to
+    event_id = f"event-{identifier}-{int(datetime.now().timestamp())}"
+
+    # Convert EventType enum to string value if needed
+    event_type_str = event_type.value if isinstance(event_type, EventType) else event_type
+
+    # Create event message
+    event_data = {
+        "event_id": event_id,
+        "user_id": user_id,
+        "event_type": event_type_str,
+        "message": message,
+        "sender": sender,
+        "subject": subject,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "metadata": metadata
+    }
+
+    # Add email_to field for email gateway mode
+    if email_to:
+        event_data["email_to"] = email_to
+
+    return event_data
+
+
 def send_notification(
         subject: str,
         message: str,
@@ -107,71 +255,24 @@ def send_notification(
     Raises:
         Exception: If message publishing fails or neither user_id nor email_to provided
     """
-    # Validate that either user_id or email_to is provided
-    if not user_id and not email_to:
-        raise Exception("Either user_id or email_to must be provided")
+    event_data = _build_event(subject, message, user_id, email_to, sender, event_type, metadata)
+    event_id = event_data["event_id"]
 
     # Default project ID
     if not project_id:
         project_id = os.getenv('GCP_PROJECT_ID', 'arxiv-development')
 
-    # Default metadata
-    if metadata is None:
-        metadata = {}
-
     # Create publisher client with explicit credentials
     try:
-        credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-        if credentials_path and os.path.exists(credentials_path):
-            from google.oauth2 import service_account
-            # Specify the Pub/Sub scopes explicitly
-            scopes = ['https://www.googleapis.com/auth/pubsub']
-            credentials = service_account.Credentials.from_service_account_file(
-                credentials_path, scopes=scopes
-            )
-            publisher = pubsub_v1.PublisherClient(credentials=credentials)
-        else:
-            publisher = pubsub_v1.PublisherClient()
-
-        topic_path = publisher.topic_path(project_id, topic_name)
+        publisher, topic_path = _get_publisher(project_id, topic_name)
 
     except Exception as e:
         if logger:
             logger.error("Failed to create Pub/Sub client", extra={"error": str(e)})
         raise Exception(f"Failed to create Pub/Sub client: {str(e)}")
 
-    # Generate unique event ID
-    if user_id:
-        if isinstance(user_id, list):
-            identifier = f"multi-{len(user_id)}-users"
-        else:
-            identifier = user_id
-    else:
-        identifier = email_to
-    event_id = f"event-{identifier}-{int(datetime.now().timestamp())}"
-
-    # Convert EventType enum to string value if needed
-    event_type_str = event_type.value if isinstance(event_type, EventType) else event_type
-
-    # Create event message
-    event_data = {
-        "event_id": event_id,
-        "user_id": user_id,
-        "event_type": event_type_str,
-        "message": message,
-        "sender": sender,
-        "subject": subject,
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-        "metadata": metadata
-    }
-
-    # Add email_to field for email gateway mode
-    if email_to:
-        event_data["email_to"] = email_to
-
-    # Convert to JSON and encode
-    message_json = json.dumps(event_data)
-    message_bytes = message_json.encode('utf-8')
+    # Convert to JSON bytes
+    message_bytes = _encode_event(event_data)
 
     # Log the notification attempt
     if logger:
@@ -199,7 +300,7 @@ def send_notification(
 
     try:
         # Try publishing via Python client first
-        future = publisher.publish(topic_path, message_bytes)
+        future = publisher.publish(topic_path, message_bytes, retry=_publish_retry())
         message_id = future.result()
 
         # Log success
@@ -224,7 +325,7 @@ def send_notification(
 
             try:
                 message_id = _send_via_rest_api(
-                    project_id, topic_name, message_json, credentials_path, logger
+                    project_id, topic_name, message_bytes, credentials_path, logger
                 )
 
                 if logger:
@@ -260,3 +361,160 @@ def send_notification(
                          })
 
         raise Exception(f"Failed to publish to {topic_path}: {str(e)}")
+
+
+def _log_publish_result(future: concurrent.futures.Future, event_id: str, topic_path: str, logger) -> None:
+    """Log the outcome of an asynchronous publish once its future resolves"""
+    error = future.exception()
+    if error is not None:
+        logger.error("Failed to publish notification",
+                     extra={
+                         "event_id": event_id,
+                         "error": str(error),
+                         "topic_path": topic_path,
+                         "error_type": type(error).__name__
+                     })
+    else:
+        logger.info("Notification published successfully via Python client",
+                    extra={
+                        "message_id": future.result(),
+                        "event_id": event_id,
+                        "topic_path": topic_path
+                    })
+
+
+def _publish_events(
+        notifications: List[Dict[str, Any]],
+        project_id: str,
+        topic_name: str,
+        logger=None
+) -> Tuple[List[bytes], List[concurrent.futures.Future]]:
+    """Publish notifications without waiting, returning the encoded messages and their futures"""
+    events = [_build_event(**notification) for notification in notifications]
+
+    try:
+        publisher, topic_path = _get_publisher(project_id, topic_name)
+
+    except Exception as e:
+        if logger:
+            logger.error("Failed to create Pub/Sub client", extra={"error": str(e)})
+        raise Exception(f"Failed to create Pub/Sub client: {str(e)}")
+
+    if logger:
+        logger.info("Sending bulk notifications",
+                    extra={
+                        "count": len(events),
+                        "topic": topic_name,
+                        "project_id": project_id
+                    })
+
+    messages = []
+    futures = []
+    for event_data in events:
+        message_bytes = _encode_event(event_data)
+        future = publisher.publish(topic_path, message_bytes, retry=_publish_retry())
+        if logger:
+            future.add_done_callback(functools.partial(
+                _log_publish_result, event_id=event_data["event_id"], topic_path=topic_path, logger=logger
+            ))
+        messages.append(message_bytes)
+        futures.append(future)
+
+    return messages, futures
+
+
+def publish_bulk_notification(
+        notifications: List[Dict[str, Any]],
+        project_id: Optional[str] = None,
+        topic_name: str = "notification-events",
+        logger=None
+) -> List[concurrent.futures.Future]:
+    """
+    Publish several notification messages without waiting for confirmation
+
+    Args:
+        notifications: Keyword arguments for each notification as accepted by send_notification
+            (subject, message, user_id, email_to, sender, event_type, metadata)
+        project_id: GCP project ID (defaults to GCP_PROJECT_ID env var or arxiv-development)
+        topic_name: Pub/Sub topic name (default: notification-events)
+        logger: Logger object for structured logging; each result is logged when it arrives
+
+    Returns:
+        List[Future]: Futures resolving to the published message IDs, in the same order as notifications
+
+    Raises:
+        Exception: If any notification is invalid or the Pub/Sub client cannot be created
+    """
+    # Default project ID
+    if not project_id:
+        project_id = os.getenv('GCP_PROJECT_ID', 'arxiv-development')
+
+    _, futures = _publish_events(notifications, project_id, topic_name, logger)
+    return futures
+
+
+def send_bulk_notification(
+        notifications: List[Dict[str, Any]],
+        project_id: Optional[str] = None,
+        topic_name: str = "notification-events",
+        logger=None
+) -> List[str]:
+    """
+    Send several notification messages, publishing all of them before waiting for any result
+
+    Messages the Python client fails to publish are retried through the REST API in as few
+    requests as possible when service account credentials are configured.
+
+    Args:
+        notifications: Keyword arguments for each notification as accepted by send_notification
+            (subject, message, user_id, email_to, sender, event_type, metadata)
+        project_id: GCP project ID (defaults to GCP_PROJECT_ID env var or arxiv-development)
+        topic_name: Pub/Sub topic name (default: notification-events)
+        logger: Logger object for structured logging
+
+    Returns:
+        List[str]: Published message IDs, in the same order as notifications
+
+    Raises:
+        Exception: If any notification is invalid or fails to publish
+    """
+    # Default project ID
+    if not project_id:
+        project_id = os.getenv('GCP_PROJECT_ID', 'arxiv-development')
+
+    messages, futures = _publish_events(notifications, project_id, topic_name, logger)
+
+    concurrent.futures.wait(futures)
+    failed = [i for i, future in enumerate(futures) if future.exception() is not None]
+    if not failed:
+        return [future.result() for future in futures]
+
+    error = futures[failed[0]].exception()
+
+    # Try REST API fallback for the messages the Python client failed to publish
+    credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+    if credentials_path and os.path.exists(credentials_path):
+        if logger:
+            logger.warning("Python client failed, trying REST API fallback",
+                           extra={"error": str(error), "count": len(failed)})
+
+        try:
+            rest_message_ids = _send_bulk_via_rest_api(
+                project_id, topic_name, [messages[i] for i in failed], credentials_path, logger
+            )
+
+        except Exception as rest_error:
+            if logger:
+                logger.error("Both Python client and REST API failed",
+                             extra={
+                                 "python_error": str(error),
+                                 "rest_error": str(rest_error)
+                             })
+            raise Exception(f"Failed to publish via both methods - Python client: {str(error)}, REST API: {str(rest_error)}")
+
+        message_ids = [None if future.exception() is not None else future.result() for future in futures]
+        for i, message_id in zip(failed, rest_message_ids):
+            message_ids[i] = message_id
+        return message_ids
+
+    raise Exception(f"Failed to publish {len(failed)} of {len(futures)} notifications to {topic_name}: {str(error)}")
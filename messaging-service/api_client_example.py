@@ -3,65 +3,201 @@
 Example client for the arXiv Messaging Service REST API
 """
 
+import asyncio
+import itertools
+import operator
+import sys
+import threading
+import httpx
+import orjson
 import requests
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Iterator, Union
+
+try:
+    import ijson
+except ImportError:  # Streaming is optional; fall back to decoding whole responses
+    ijson = None
+
+
+# Optional subscription fields accepted by the create and update endpoints
+_CREATE_SUBSCRIPTION_OPTIONS = frozenset({
+    'aggregation_method', 'delivery_error_strategy', 'delivery_time', 'timezone', 'enabled'
+})
+_UPDATE_SUBSCRIPTION_FIELDS = _CREATE_SUBSCRIPTION_OPTIONS | {
+    'delivery_method', 'aggregation_frequency', 'email_address', 'slack_webhook_url'
+}
+
+
+_user_columns = operator.itemgetter('user_id', 'undelivered_count', 'enabled_subscriptions')
+
+
+def _format_users(users: List[dict]) -> str:
+    """Format user summary rows for display"""
+    return "\n".join(
+        f"   {user_id}: {undelivered} undelivered, {enabled} active subscriptions"
+        for user_id, undelivered, enabled in map(_user_columns, users)
+    )
+
+
+def _isoformat(timestamp: Union[datetime, str]) -> str:
+    """Format a timestamp for the API, passing already formatted ISO strings through"""
+    return timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+
 
 class MessagingAPIClient:
     """Client for the arXiv Messaging Service REST API"""
     
-    def __init__(self, base_url: str = "http://localhost:8080"):
+    def __init__(self, base_url: str = "http://localhost:8080", pool_size: int = 32,
+                 shared_session: bool = False):
         self.base_url = base_url.rstrip('/')
-        self.session = requests.Session()
+        # Endpoint URLs are built once; per-user paths only need their IDs filled in
+        self._health_url = self.base_url + "/health"
+        self._users_url = self.base_url + "/users"
+        self._undelivered_url = self.base_url + "/undelivered"
+        self._undelivered_stats_url = self._undelivered_url + "/stats"
+        self._flush_url = self.base_url + "/flush"
+        self._user_messages_url = self._users_url + "/{}/messages"
+        self._user_message_url = self._user_messages_url + "/{}"
+        self._user_subscriptions_url = self._users_url + "/{}/subscriptions"
+        self._user_subscription_url = self._user_subscriptions_url + "/{}"
+        self.pool_size = pool_size
+        # By default each thread gets its own session so concurrent callers do not contend for
+        # one pool. A shared session instead lets a short fan-out of GETs reuse the same kept-alive
+        # connections; its adapter pool is thread-safe as long as pool_size covers the threads.
+        self._local = threading.local()
+        self._shared_session = self._new_session() if shared_session else None
+
+    @property
+    def session(self) -> requests.Session:
+        """The shared HTTP session, or the calling thread's one, created on first use"""
+        if self._shared_session is not None:
+            return self._shared_session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        return session
+
+    def _new_session(self) -> requests.Session:
+        """Create a pooled, retrying HTTP session"""
+        session = requests.Session()
+        # Keep connections open across calls; retry idempotent requests on throttling and gateway
+        # errors, honouring Retry-After. POST (flush, create) is not retried to avoid repeating it.
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504],
+                              allowed_methods=['GET', 'PUT', 'DELETE'], raise_on_status=False)
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # Advertise every encoding urllib3 can decode here (zstd and br when their packages are installed)
+        session.headers.update({'Connection': 'keep-alive', 'Accept-Encoding': ACCEPT_ENCODING})
+        return session
         
     def health_check(self) -> dict:
         """Check if the API is healthy"""
-        response = self.session.get(f"{self.base_url}/health")
+        response = self.session.get(self._health_url)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
         
+    def _send_json(self, method: str, url: str, payload: dict, **kwargs) -> requests.Response:
+        """Send a request with a JSON body serialized by orjson"""
+        return self.session.request(
+            method,
+            url,
+            data=orjson.dumps(payload),
+            headers={'Content-Type': 'application/json'},
+            **kwargs
+        )
+
+    def _iter_json_array(self, url: str, params: dict) -> Iterator[dict]:
+        """Yield the items of a JSON array response, decoding them as they arrive when ijson is available
+
+        Closing the generator early stops reading the rest of the response body.
+        """
+        with self.session.get(url, params=params, stream=True) as response:
+            response.raise_for_status()
+            if ijson is None:
+                yield from orjson.loads(response.content)
+                return
+            response.raw.decode_content = True
+            yield from ijson.items(response.raw, 'item', use_float=True)
+
+    def iter_users(self, include_empty: bool = False) -> Iterator[dict]:
+        """Iterate over users with their subscription and undelivered message counts"""
+        return self._iter_json_array(self._users_url, {'include_empty': include_empty})
+
     def list_users(self, include_empty: bool = False) -> List[dict]:
         """List all users with their subscription and undelivered message counts"""
-        params = {'include_empty': include_empty}
-        response = self.session.get(f"{self.base_url}/users", params=params)
-        response.raise_for_status()
-        return response.json()
+        return list(self.iter_users(include_empty))
     
+    def iter_user_messages(self,
+                           user_id: str,
+                           limit: Optional[int] = None,
+                           event_type: Optional[str] = None) -> Iterator[dict]:
+        """Iterate over undelivered messages for a specific user"""
+        params = {}
+        if limit:
+            params['limit'] = limit
+        if event_type:
+            params['event_type'] = event_type
+        return self._iter_json_array(self._user_messages_url.format(user_id), params)
+
     def get_user_messages(self, 
                          user_id: str, 
                          limit: Optional[int] = None,
                          event_type: Optional[str] = None) -> List[dict]:
         """Get undelivered messages for a specific user"""
+        return list(self.iter_user_messages(user_id, limit, event_type))
+    
+    def iter_undelivered_messages(self,
+                                  limit: Optional[int] = 100,
+                                  event_type: Optional[str] = None) -> Iterator[dict]:
+        """Iterate over undelivered messages across all users (admin view)"""
         params = {}
         if limit:
             params['limit'] = limit
         if event_type:
             params['event_type'] = event_type
-            
-        response = self.session.get(f"{self.base_url}/users/{user_id}/messages", params=params)
-        response.raise_for_status()
-        return response.json()
-    
+        return self._iter_json_array(self._undelivered_url, params)
+
+    def _iter_undelivered_pages(self, page_size: int, event_type: Optional[str]) -> Iterator[List[dict]]:
+        """Yield successive pages of undelivered messages, following the server's X-Next-Cursor header"""
+        params = {'page_size': page_size}
+        if event_type:
+            params['event_type'] = event_type
+        while True:
+            response = self.session.get(self._undelivered_url, params=params)
+            response.raise_for_status()
+            yield orjson.loads(response.content)
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                return
+            params['cursor'] = cursor
+
+    def iter_all_undelivered_messages(self,
+                                      page_size: int = 500,
+                                      event_type: Optional[str] = None) -> Iterator[dict]:
+        """Iterate over every undelivered message, fetching pages lazily over the same connection"""
+        return itertools.chain.from_iterable(self._iter_undelivered_pages(page_size, event_type))
+
     def list_all_undelivered_messages(self, 
                                      limit: Optional[int] = 100,
                                      event_type: Optional[str] = None) -> List[dict]:
         """List all undelivered messages across all users (admin view)"""
-        params = {}
-        if limit:
-            params['limit'] = limit
-        if event_type:
-            params['event_type'] = event_type
-            
-        response = self.session.get(f"{self.base_url}/undelivered", params=params)
-        response.raise_for_status()
-        return response.json()
+        return list(self.iter_undelivered_messages(limit, event_type))
     
     def get_undelivered_stats(self) -> dict:
         """Get statistics about undelivered messages"""
-        response = self.session.get(f"{self.base_url}/undelivered/stats")
+        response = self.session.get(self._undelivered_stats_url)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def flush_messages(self, 
                       user_id: Optional[str] = None,
@@ -75,38 +211,38 @@ class MessagingAPIClient:
         if user_id:
             payload['user_id'] = user_id
             
-        response = self.session.post(f"{self.base_url}/flush", json=payload)
+        response = self._send_json("POST", self._flush_url, payload)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def get_user_message(self, user_id: str, message_id: str) -> dict:
         """Get a specific message for a user"""
-        response = self.session.get(f"{self.base_url}/users/{user_id}/messages/{message_id}")
+        response = self.session.get(self._user_message_url.format(user_id, message_id))
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def delete_user_message(self, user_id: str, message_id: str) -> dict:
         """Delete a specific message for a user"""
-        response = self.session.delete(f"{self.base_url}/users/{user_id}/messages/{message_id}")
+        response = self.session.delete(self._user_message_url.format(user_id, message_id))
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def delete_user_messages(self, 
                             user_id: str,
-                            before_timestamp: Optional[datetime] = None) -> dict:
-        """Delete all messages for a user, optionally before a timestamp"""
+                            before_timestamp: Optional[Union[datetime, str]] = None) -> dict:
+        """Delete all messages for a user, optionally before a timestamp (datetime or ISO 8601 string)"""
         params = {}
         if before_timestamp:
-            params['before_timestamp'] = before_timestamp.isoformat()
+            params['before_timestamp'] = _isoformat(before_timestamp)
             
-        response = self.session.delete(f"{self.base_url}/users/{user_id}/messages", params=params)
+        response = self.session.delete(self._user_messages_url.format(user_id), params=params)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def delete_messages_bulk(self, 
                             user_id: Optional[str] = None,
                             event_ids: Optional[List[str]] = None,
-                            before_timestamp: Optional[datetime] = None) -> dict:
+                            before_timestamp: Optional[Union[datetime, str]] = None) -> dict:
         """Bulk delete undelivered messages (admin operation)"""
         payload = {}
         if user_id:
@@ -114,19 +250,19 @@ class MessagingAPIClient:
         if event_ids:
             payload['event_ids'] = event_ids
         if before_timestamp:
-            payload['before_timestamp'] = before_timestamp.isoformat()
+            payload['before_timestamp'] = _isoformat(before_timestamp)
             
-        response = self.session.delete(f"{self.base_url}/undelivered", json=payload)
+        response = self._send_json("DELETE", self._undelivered_url, payload)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
 
     # Subscription Management Methods
     
     def get_user_subscriptions(self, user_id: str) -> List[dict]:
         """Get all subscriptions for a user"""
-        response = self.session.get(f"{self.base_url}/users/{user_id}/subscriptions")
+        response = self.session.get(self._user_subscriptions_url.format(user_id))
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def create_user_subscription(self, 
                                 user_id: str,
@@ -139,72 +275,219 @@ class MessagingAPIClient:
         payload = {
             'user_id': user_id,
             'delivery_method': delivery_method,
-            'aggregation_frequency': aggregation_frequency
+            'aggregation_frequency': aggregation_frequency,
+            **({'email_address': email_address} if email_address else {}),
+            **({'slack_webhook_url': slack_webhook_url} if slack_webhook_url else {}),
+            # Add optional parameters the API accepts
+            **{k: v for k, v in kwargs.items() if v is not None and k in _CREATE_SUBSCRIPTION_OPTIONS}
         }
         
-        if email_address:
-            payload['email_address'] = email_address
-        if slack_webhook_url:
-            payload['slack_webhook_url'] = slack_webhook_url
-            
-        # Add optional parameters
-        for key, value in kwargs.items():
-            if value is not None:
-                payload[key] = value
-        
-        response = self.session.post(f"{self.base_url}/users/{user_id}/subscriptions", json=payload)
+        response = self._send_json("POST", self._user_subscriptions_url.format(user_id), payload)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def get_user_subscription(self, user_id: str, subscription_id: str) -> dict:
         """Get a specific subscription for a user"""
-        response = self.session.get(f"{self.base_url}/users/{user_id}/subscriptions/{subscription_id}")
+        response = self.session.get(self._user_subscription_url.format(user_id, subscription_id))
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def update_user_subscription(self, 
                                 user_id: str, 
                                 subscription_id: str,
                                 **updates) -> dict:
         """Update a specific subscription for a user"""
-        # Remove None values
-        payload = {k: v for k, v in updates.items() if v is not None}
+        # Remove None values and fields the API does not update
+        payload = {k: v for k, v in updates.items() if v is not None and k in _UPDATE_SUBSCRIPTION_FIELDS}
         
-        response = self.session.put(f"{self.base_url}/users/{user_id}/subscriptions/{subscription_id}", json=payload)
+        response = self._send_json("PUT", self._user_subscription_url.format(user_id, subscription_id), payload)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def delete_user_subscription(self, user_id: str, subscription_id: str) -> dict:
         """Delete a specific subscription for a user"""
-        response = self.session.delete(f"{self.base_url}/users/{user_id}/subscriptions/{subscription_id}")
+        response = self.session.delete(self._user_subscription_url.format(user_id, subscription_id))
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+class AsyncMessagingAPIClient:
+    """Asynchronous client for the arXiv Messaging Service REST API
+
+    Independent calls can be awaited together and share one pooled connection set.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:8080", http2: bool = False, pool_size: int = 32):
+        # HTTP/2 needs the h2 package and a server that speaks it; uvicorn serves HTTP/1.1 only
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            http2=http2,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs):
+        response = await self.client.request(method, path, **kwargs)
         response.raise_for_status()
         return response.json()
 
+    async def health_check(self) -> dict:
+        """Check if the API is healthy"""
+        return await self._request("GET", "/health")
+
+    async def list_users(self, include_empty: bool = False) -> List[dict]:
+        """List all users with their subscription and undelivered message counts"""
+        return await self._request("GET", "/users", params={'include_empty': include_empty})
+
+    async def get_user_messages(self,
+                                user_id: str,
+                                limit: Optional[int] = None,
+                                event_type: Optional[str] = None) -> List[dict]:
+        """Get undelivered messages for a specific user"""
+        params = {}
+        if limit:
+            params['limit'] = limit
+        if event_type:
+            params['event_type'] = event_type
+        return await self._request("GET", f"/users/{user_id}/messages", params=params)
+
+    async def list_all_undelivered_messages(self,
+                                            limit: Optional[int] = 100,
+                                            event_type: Optional[str] = None) -> List[dict]:
+        """List all undelivered messages across all users (admin view)"""
+        params = {}
+        if limit:
+            params['limit'] = limit
+        if event_type:
+            params['event_type'] = event_type
+        return await self._request("GET", "/undelivered", params=params)
+
+    async def get_undelivered_stats(self) -> dict:
+        """Get statistics about undelivered messages"""
+        return await self._request("GET", "/undelivered/stats")
+
+    async def flush_messages(self,
+                             user_id: Optional[str] = None,
+                             force_delivery: bool = False,
+                             dry_run: bool = False) -> dict:
+        """Flush undelivered messages"""
+        payload = {
+            'force_delivery': force_delivery,
+            'dry_run': dry_run
+        }
+        if user_id:
+            payload['user_id'] = user_id
+        return await self._request("POST", "/flush", json=payload)
+
+    async def get_user_message(self, user_id: str, message_id: str) -> dict:
+        """Get a specific message for a user"""
+        return await self._request("GET", f"/users/{user_id}/messages/{message_id}")
+
+    async def get_user_subscriptions(self, user_id: str) -> List[dict]:
+        """Get all subscriptions for a user"""
+        return await self._request("GET", f"/users/{user_id}/subscriptions")
+
+    async def get_user_subscription(self, user_id: str, subscription_id: str) -> dict:
+        """Get a specific subscription for a user"""
+        return await self._request("GET", f"/users/{user_id}/subscriptions/{subscription_id}")
+
+
+async def async_main():
+    """Example usage of the asynchronous API client
+
+    Calls are grouped by what they depend on; each group is issued together.
+    """
+
+    async with AsyncMessagingAPIClient("http://localhost:8080") as client:
+        try:
+            # Stage 1: nothing depends on anything else yet
+            health, users, stats, messages, dry_run_result = await asyncio.gather(
+                client.health_check(),
+                client.list_users(),
+                client.get_undelivered_stats(),
+                client.list_all_undelivered_messages(limit=5),
+                client.flush_messages(dry_run=True)
+            )
+            print(f"🏥 Health: {health.get('status')}")
+            print(f"👥 Users with undelivered messages: {len(users)}")
+            if users:
+                print(_format_users(users[:5]))
+            print(f"📊 Total undelivered events: {stats['total_undelivered_events']}")
+            print(f"📬 Sample undelivered messages: {len(messages)}")
+            print(f"🔍 Dry run flush would process {dry_run_result['users_processed']} users")
+
+            # Stage 2: calls that only need the first user
+            if users:
+                user_id = users[0]['user_id']
+                user_messages, user_flush, subscriptions = await asyncio.gather(
+                    client.get_user_messages(user_id, limit=3),
+                    client.flush_messages(user_id=user_id, dry_run=True),
+                    client.get_user_subscriptions(user_id)
+                )
+                print(f"📋 User '{user_id}': {len(user_messages)} messages, {len(subscriptions)} subscriptions")
+                print(f"🚰 Dry run flush for '{user_id}' would process {user_flush['users_processed']} users")
+
+                # Stage 3: details for items found in stage 2
+                details = []
+                if user_messages:
+                    details.append(client.get_user_message(user_id, user_messages[0]['event_id']))
+                if subscriptions:
+                    details.append(client.get_user_subscription(user_id, subscriptions[0]['subscription_id']))
+                for detail in await asyncio.gather(*details):
+                    print(f"   {detail.get('subject') or detail.get('delivery_method')}")
+            print()
+            print("✅ Async API client example completed successfully!")
+
+        except httpx.ConnectError:
+            print("❌ Error: Could not connect to the API server.")
+            print("   Make sure the messaging service is running on http://localhost:8080")
+            print("   Start it with: python main.py")
+
+        except httpx.HTTPStatusError as e:
+            print(f"❌ HTTP Error: {e}")
+            print(f"   Response: {e.response.text}")
+
+        except Exception as e:
+            print(f"❌ Unexpected error: {e}")
+
 def main():
     """Example usage of the API client"""
     
-    # Initialize client
-    client = MessagingAPIClient("http://localhost:8080")
+    # Initialize client; the fan-out below shares its one session rather than opening a pool per thread
+    client = MessagingAPIClient("http://localhost:8080", shared_session=True)
     
     try:
+        # Steps 1-4 are independent GETs, so issue them together over the shared session
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            health_future = executor.submit(client.health_check)
+            users_future = executor.submit(client.list_users)
+            stats_future = executor.submit(client.get_undelivered_stats)
+            messages_future = executor.submit(client.list_all_undelivered_messages, limit=5)
+
         # 1. Health check
         print("🏥 Health Check:")
-        health = client.health_check()
+        health = health_future.result()
         print(f"   Status: {health.get('status')}")
         print()
         
         # 2. List users
         print("👥 Users with undelivered messages:")
-        users = client.list_users()
-        for user in users[:5]:  # Show first 5
-            print(f"   {user['user_id']}: {user['undelivered_count']} undelivered, "
-                  f"{user['enabled_subscriptions']} active subscriptions")
+        users = users_future.result()
+        if users:
+            print(_format_users(users[:5]))  # Show first 5
         print(f"   ... and {max(0, len(users) - 5)} more users")
         print()
         
         # 3. Get statistics
         print("📊 Undelivered Message Statistics:")
-        stats = client.get_undelivered_stats()
+        stats = stats_future.result()
         print(f"   Total users with undelivered: {stats['total_users_with_undelivered']}")
         print(f"   Total undelivered events: {stats['total_undelivered_events']}")
         print("   Events by type:")
@@ -214,7 +497,7 @@ def main():
         
         # 4. List some undelivered messages (admin view)
         print("📬 Sample Undelivered Messages (Admin View):")
-        messages = client.list_all_undelivered_messages(limit=5)
+        messages = messages_future.result()
         for msg in messages:
             timestamp = msg['timestamp'][:19] if isinstance(msg['timestamp'], str) else str(msg['timestamp'])[:19]
             print(f"   {msg['event_id'][:12]}... | {msg['user_id'][:15]:15} | "
@@ -316,4 +599,7 @@ def main():
         print(f"❌ Unexpected error: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if '--sync' in sys.argv[1:]:
+        main()
+    else:
+        asyncio.run(async_main())
\ No newline at end of file
@@ -5,24 +5,33 @@ Embeds Google Cloud identity token in all requests automatically
 """
 
 import argparse
+import asyncio
+import contextlib
+import logging
 import os
 import subprocess
 import sys
 import threading
 import time
 from datetime import datetime, timedelta
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import httpx
 import requests
 import json
 import structlog
+import uvicorn
+import google.auth
+import google.auth.exceptions
+import google.oauth2.id_token
+from google.auth.transport.requests import AuthorizedSession, Request
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
 
 # Configure logging
 structlog.configure(
     processors=[
         structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
@@ -34,18 +43,79 @@ structlog.configure(
     cache_logger_on_first_use=True,
 )
 
+# Per-request logs are at DEBUG; set LOG_LEVEL=DEBUG to see them
+logging.basicConfig(
+    format="%(message)s",
+    level=os.getenv('LOG_LEVEL', 'WARNING').upper(),
+)
+
 logger = structlog.get_logger(__name__)
 
+# Identity tokens are cached here so a restarted proxy can reuse a still-valid token
+TOKEN_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'arxiv-proxy', 'token.json')
+
 class TokenManager:
     """Manages Google Cloud identity tokens with automatic refresh"""
     
-    def __init__(self):
-        self.token = None
-        self.expires_at = None
+    def __init__(self, audience):
+        self.audience = audience
+        # (token, expires_at), replaced as one object so lock-free readers always see a matching pair
+        self.state = (None, None)
+        self.credentials = None
+        self.auth_request = Request()
         self.refresh_lock = threading.Lock()
+        self.load_cached_token()
+    
+    def load_cached_token(self):
+        """Reuse a token cached by a previous run if it is for this audience"""
+        try:
+            with open(TOKEN_CACHE_PATH, 'r') as file:
+                cached = json.load(file)
+            if cached['audience'] == self.audience:
+                expires_at = datetime.fromisoformat(cached['expires_at'])
+                self.state = (cached['token'], expires_at)
+                logger.info("Loaded cached identity token", expires_at=expires_at.isoformat())
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    def save_cached_token(self):
+        """Atomically write the current token to the cache, readable only by this user"""
+        token, expires_at = self.state
+        try:
+            os.makedirs(os.path.dirname(TOKEN_CACHE_PATH), exist_ok=True)
+            tmp_path = f"{TOKEN_CACHE_PATH}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as file:
+                json.dump({
+                    'audience': self.audience,
+                    'token': token,
+                    'expires_at': expires_at.isoformat()
+                }, file)
+            os.replace(tmp_path, TOKEN_CACHE_PATH)
+        except OSError as e:
+            logger.warning("Failed to write token cache", file=TOKEN_CACHE_PATH, error=str(e))
     
     def get_identity_token(self):
-        """Get a fresh Google Cloud identity token"""
+        """Get a fresh Google Cloud identity token and its expiry time (UTC)"""
+        try:
+            if self.credentials is None:
+                self.credentials = google.oauth2.id_token.fetch_id_token_credentials(
+                    self.audience, request=self.auth_request
+                )
+            self.credentials.refresh(self.auth_request)
+            # Google identity tokens typically last 1 hour
+            expires_at = self.credentials.expiry or datetime.utcnow() + timedelta(minutes=55)
+            return self.credentials.token, expires_at
+        except google.auth.exceptions.DefaultCredentialsError as e:
+            # User credentials from `gcloud auth login` cannot mint identity tokens through google-auth
+            logger.info("No service account credentials, falling back to gcloud", reason=str(e))
+            # Google identity tokens typically last 1 hour
+            return self.get_gcloud_identity_token(), datetime.utcnow() + timedelta(minutes=55)
+        except google.auth.exceptions.GoogleAuthError as e:
+            raise Exception(f"Failed to get identity token: {e}")
+    
+    def get_gcloud_identity_token(self):
+        """Get an identity token from the gcloud CLI"""
         try:
             result = subprocess.run(
                 ['gcloud', 'auth', 'print-identity-token'],
@@ -60,166 +130,201 @@ class TokenManager:
         except subprocess.TimeoutExpired:
             raise Exception("Timeout getting identity token")
     
+    def is_valid(self, token, expires_at, buffer):
+        """Check whether a token is usable for at least another buffer of time"""
+        return bool(token and expires_at and datetime.utcnow() < expires_at - buffer)
+    
+    def refresh_token(self):
+        """Fetch and cache a new token; the caller must hold refresh_lock"""
+        logger.info("Refreshing identity token")
+        try:
+            token, expires_at = self.get_identity_token()
+            self.state = (token, expires_at)
+            logger.info("Identity token refreshed", expires_at=expires_at.isoformat())
+            self.save_cached_token()
+        except Exception as e:
+            logger.error("Failed to refresh token", error=str(e))
+            raise
+    
+    def get_valid_token(self):
+        """Get the current token without blocking, or None if it needs refreshing"""
+        token, expires_at = self.state
+        return token if self.is_valid(token, expires_at, timedelta(minutes=5)) else None
+    
     def get_token(self):
         """Get valid token, refreshing if necessary"""
+        # Fast path: the background refresher normally keeps the token fresh
+        token = self.get_valid_token()
+        if token:
+            return token
+        
         with self.refresh_lock:
-            now = datetime.now()
-            
             # Refresh token if it doesn't exist or expires soon (5 min buffer)
-            if not self.token or not self.expires_at or now >= (self.expires_at - timedelta(minutes=5)):
-                logger.info("Refreshing identity token")
-                try:
-                    self.token = self.get_identity_token()
-                    # Google identity tokens typically last 1 hour
-                    self.expires_at = now + timedelta(minutes=55)
-                    logger.info("Identity token refreshed", expires_at=self.expires_at.isoformat())
-                except Exception as e:
-                    logger.error("Failed to refresh token", error=str(e))
-                    raise
-            
-            return self.token
-
-class AuthenticatedProxyHandler(BaseHTTPRequestHandler):
-    """HTTP request handler that proxies requests with authentication"""
-    
-    def __init__(self, token_manager, target_url, *args, **kwargs):
-        self.token_manager = token_manager
-        self.target_url = target_url.rstrip('/')
-        super().__init__(*args, **kwargs)
-    
-    def log_message(self, format, *args):
-        """Override to use structured logging"""
-        logger.info("HTTP Request", 
-                   method=self.command,
-                   path=self.path,
-                   client=self.client_address[0])
-    
-    def do_GET(self):
-        self._proxy_request('GET')
-    
-    def do_POST(self):
-        self._proxy_request('POST')
+            if not self.is_valid(*self.state, timedelta(minutes=5)):
+                self.refresh_token()
+            return self.state[0]
     
-    def do_PUT(self):
-        self._proxy_request('PUT')
+    def start_background_refresh(self):
+        """Refresh the token ahead of expiry in a daemon thread so requests never wait on it"""
+        threading.Thread(target=self._refresher, name="token-refresher", daemon=True).start()
     
-    def do_DELETE(self):
-        self._proxy_request('DELETE')
-    
-    def do_PATCH(self):
-        self._proxy_request('PATCH')
+    def _refresher(self):
+        while True:
+            # Wake 10 minutes before expiry, ahead of the 5 minute buffer checked by get_token,
+            # but never spin if a token arrives with less lifetime than that
+            _, expires_at = self.state
+            if expires_at:
+                delay = (expires_at - timedelta(minutes=10) - datetime.utcnow()).total_seconds()
+                time.sleep(max(delay, 30))
+            try:
+                with self.refresh_lock:
+                    if not self.is_valid(*self.state, timedelta(minutes=10)):
+                        self.refresh_token()
+            except Exception:
+                # Already logged; get_token still refreshes on demand if this keeps failing
+                time.sleep(30)
+
+# Headers that are not forwarded; ASGI request header names are already lower case
+HOP_BY_HOP_REQUEST_HEADERS = frozenset((
+    b'host', b'connection', b'proxy-connection', b'keep-alive', b'te', b'trailer',
+    b'transfer-encoding', b'upgrade', b'authorization'
+))
+HOP_BY_HOP_RESPONSE_HEADERS = frozenset((b'connection', b'keep-alive', b'transfer-encoding'))
+# Upstream bodies are relayed in chunks of this size; a shorter first chunk holds the whole body
+RESPONSE_CHUNK_SIZE = 65536
+
+async def _forward_body(upstream, chunks, first_chunk, method):
+    """Relay the upstream body as it arrives, closing the upstream response when done
+
+    The body has to pass through Python: the target service is reached over TLS and
+    neither httpx nor uvicorn expose their sockets, so there is no sendfile path.
+    """
+    bytes_written = len(first_chunk)
+    try:
+        yield first_chunk
+        async for chunk in chunks:
+            bytes_written += len(chunk)
+            yield chunk
+    except (GeneratorExit, asyncio.CancelledError):
+        # Client disconnected, this is normal
+        logger.info("Client disconnected during response",
+                   method=method,
+                   bytes_sent=bytes_written)
+        raise
+    finally:
+        await upstream.aclose()
     
-    def do_HEAD(self):
-        self._proxy_request('HEAD')
+    logger.debug("Request completed", 
+               method=method,
+               status_code=upstream.status_code,
+               response_size=bytes_written)
+
+def create_app(token_manager, target_url, max_connections):
+    """Create the proxy application, sharing one upstream connection pool across all requests"""
+    # The target never changes, so each request only appends its path and query to this prefix
+    target_prefix = (target_url.rstrip('/') + '/').encode('latin-1')
     
-    def do_OPTIONS(self):
-        self._proxy_request('OPTIONS')
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # HTTP/2 multiplexes concurrent requests over a few TLS connections to Cloud Run
+        async with httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections // 2),
+            transport=httpx.AsyncHTTPTransport(http2=True, retries=2),
+            timeout=60
+        ) as client:
+            app.state.client = client
+            yield
     
-    def _proxy_request(self, method):
+    async def proxy_request(request):
         """Proxy the request to the target service with authentication"""
+        method = request.method
         try:
-            # Get fresh token
-            token = self.token_manager.get_token()
+            # The background refresher normally keeps the token fresh, so only
+            # hand off to a thread when a blocking refresh is actually needed
+            token = token_manager.get_valid_token() or await asyncio.to_thread(token_manager.get_token)
             
             # Build target URL
-            target_path = self.path
-            if self.path.startswith('/'):
-                target_path = self.path[1:]  # Remove leading slash
-            full_url = f"{self.target_url}/{target_path}" if target_path else self.target_url
-            
-            # Read request body if present
-            content_length = int(self.headers.get('Content-Length', 0))
-            request_body = self.rfile.read(content_length) if content_length > 0 else None
+            full_url = target_prefix + request.scope['raw_path'].lstrip(b'/')
+            if request.scope['query_string']:
+                full_url += b'?' + request.scope['query_string']
+            full_url = full_url.decode('latin-1')
             
-            # Prepare headers
-            proxy_headers = {}
-            for header, value in self.headers.items():
-                # Skip headers that should not be forwarded
-                if header.lower() not in ['host', 'connection', 'content-length']:
-                    proxy_headers[header] = value
+            # Prepare headers, skipping those that should not be forwarded
+            proxy_headers = [(header, value) for header, value in request.headers.raw
+                             if header not in HOP_BY_HOP_REQUEST_HEADERS]
+            proxy_headers.append((b'authorization', f'Bearer {token}'.encode('latin-1')))
             
-            # Add authentication header
-            proxy_headers['Authorization'] = f'Bearer {token}'
+            # Stream the request body through when there is one
+            has_body = 'content-length' in request.headers or 'transfer-encoding' in request.headers
             
-            logger.info("Proxying request", 
+            logger.debug("Proxying request", 
                        method=method,
                        url=full_url,
                        headers_count=len(proxy_headers),
-                       body_size=len(request_body) if request_body else 0)
+                       body_size=int(request.headers.get('content-length', 0)))
             
-            # Make the request
-            response = requests.request(
-                method=method,
-                url=full_url,
-                headers=proxy_headers,
-                data=request_body,
-                timeout=60,
+            client = request.app.state.client
+            upstream = await client.send(
+                client.build_request(method, full_url, headers=proxy_headers,
+                                     content=request.stream() if has_body else None),
                 stream=True
             )
             
-            # Send response status
-            self.send_response(response.status_code)
-            
-            # Forward response headers
-            for header, value in response.headers.items():
-                # Skip headers that should not be forwarded
-                if header.lower() not in ['connection', 'transfer-encoding']:
-                    self.send_header(header, value)
-            self.end_headers()
-            
-            # Forward response body
-            bytes_written = 0
+            # Wait for the first chunk so the headers go out immediately followed by the body
+            chunks = upstream.aiter_raw(RESPONSE_CHUNK_SIZE)
             try:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        self.wfile.write(chunk)
-                        bytes_written += len(chunk)
-            except BrokenPipeError:
-                # Client disconnected, this is normal
-                logger.info("Client disconnected during response",
-                           method=method,
-                           bytes_sent=bytes_written)
-                return
-            
-            logger.info("Request completed", 
-                       method=method,
-                       status_code=response.status_code,
-                       response_size=bytes_written)
-            
+                first_chunk = await anext(chunks, b'')
+            except Exception:
+                await upstream.aclose()
+                raise
         except Exception as e:
             logger.error("Proxy request failed", 
                         method=method,
                         error=str(e),
                         error_type=type(e).__name__)
-            
-            # Send error response (handle broken pipe gracefully)
-            try:
-                self.send_error(502, f"Proxy Error: {str(e)}")
-            except (BrokenPipeError, ConnectionResetError):
-                # Client disconnected, cannot send error response
-                logger.info("Cannot send error response, client disconnected", method=method)
+            return PlainTextResponse(f"Proxy Error: {str(e)}", status_code=502)
+        
+        # Forward the response as-is; the body is relayed still encoded
+        response_headers = [(header, value) for header, value in upstream.headers.raw
+                            if header.lower() not in HOP_BY_HOP_RESPONSE_HEADERS]
+        
+        if len(first_chunk) < RESPONSE_CHUNK_SIZE:
+            # The whole body has arrived, so send it as one sized body rather than a chunked stream
+            await upstream.aclose()
+            if first_chunk and 'content-length' not in upstream.headers:
+                response_headers.append((b'content-length', str(len(first_chunk)).encode()))
+            logger.debug("Request completed", 
+                       method=method,
+                       status_code=upstream.status_code,
+                       response_size=len(first_chunk))
+            response = Response(first_chunk, status_code=upstream.status_code)
+        else:
+            response = StreamingResponse(_forward_body(upstream, chunks, first_chunk, method),
+                                         status_code=upstream.status_code)
+        response.raw_headers = response_headers
+        return response
+    
+    return Starlette(
+        routes=[Route('/{path:path}', proxy_request,
+                      methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS'])],
+        lifespan=lifespan
+    )
 
 def get_service_url(project_id, service_name, region):
-    """Get the Cloud Run service URL using gcloud"""
+    """Get the Cloud Run service URL from the Cloud Run Admin API"""
     try:
-        result = subprocess.run([
-            'gcloud', 'run', 'services', 'describe', service_name,
-            '--region', region,
-            '--project', project_id,
-            '--format', 'value(status.url)'
-        ], capture_output=True, text=True, check=True, timeout=30)
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"Failed to get service URL: {e.stderr}")
-    except subprocess.TimeoutExpired:
-        raise Exception("Timeout getting service URL")
-
-def create_handler_class(token_manager, target_url):
-    """Create a request handler class with injected dependencies"""
-    class Handler(AuthenticatedProxyHandler):
-        def __init__(self, *args, **kwargs):
-            super().__init__(token_manager, target_url, *args, **kwargs)
-    return Handler
+        credentials, _ = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
+        response = AuthorizedSession(credentials).get(
+            f"https://run.googleapis.com/v2/projects/{project_id}/locations/{region}/services/{service_name}",
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()['uri']
+    except google.auth.exceptions.GoogleAuthError as e:
+        raise Exception(f"Failed to get service URL: {e}")
+    except requests.RequestException as e:
+        raise Exception(f"Failed to get service URL: {e}")
 
 def main():
     parser = argparse.ArgumentParser(description='Authenticated proxy for Cloud Run services')
@@ -236,6 +341,10 @@ def main():
                        type=int,
                        default=8080,
                        help='Local proxy port (default: 8080)')
+    parser.add_argument('--max-connections',
+                       type=int,
+                       default=200,
+                       help='Maximum concurrent connections to the target service (default: 200)')
     parser.add_argument('--service-url',
                        help='Service URL (if not provided, will be retrieved automatically)')
     
@@ -253,15 +362,26 @@ def main():
         
         # Initialize token manager
         print("🔐 Initializing authentication...")
-        token_manager = TokenManager()
+        token_manager = TokenManager(service_url)
         
         # Test token acquisition
         token_manager.get_token()
+        token_manager.start_background_refresh()
         print("✅ Authentication successful")
         
-        # Create HTTP server
-        handler_class = create_handler_class(token_manager, service_url)
-        server = HTTPServer(('localhost', args.port), handler_class)
+        # Create HTTP server; upstream responses already carry their own Date and Server headers
+        app = create_app(token_manager, service_url, args.max_connections)
+        server = uvicorn.Server(uvicorn.Config(
+            app,
+            host='localhost',
+            port=args.port,
+            # uvloop when it is installed, otherwise the standard asyncio loop
+            loop='auto',
+            log_config=None,
+            access_log=False,
+            server_header=False,
+            date_header=False
+        ))
         
         print(f"🚀 Starting authenticated proxy server...")
         print(f"📡 Local URL: http://localhost:{args.port}")
@@ -275,8 +395,8 @@ def main():
         print(f"Press Ctrl+C to stop the proxy")
         print(f"")
         
-        # Start server
-        server.serve_forever()
+        # Start server on the configured event loop
+        server.run()
         
     except KeyboardInterrupt:
         print("\n👋 Stopping proxy server...")
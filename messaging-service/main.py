@@ -1,80 +1,262 @@
+"""
+Cloud Run entry point for the messaging service
+
+Child processes (the Pub/Sub processor and uvicorn's API workers) are always started with
+the "spawn" method, never fork, so each one creates its own gRPC channels for Pub/Sub and
+Firestore instead of inheriting the parent's, which gRPC does not support across fork.
+"""
+
 import os
+import asyncio
 import logging
+import multiprocessing
+import multiprocessing.connection
 import signal
+import socket
 import sys
 import threading
-import asyncio
+from dataclasses import dataclass
+from typing import Optional
 import structlog
 import uvicorn
 from src.message_server import EventAggregationSystem
 from src.api import app
+# Imported on first use by google.auth when the first Firestore client looks up Cloud Run's
+# default credentials; loading it here keeps that work in container start-up instead
+import google.auth.compute_engine  # noqa: F401
+
+try:
+    import orjson
+except ImportError:  # Rendering falls back to the standard json module
+    orjson = None
 
-# Configure structured JSON logging
+# Identifies this instance in Cloud Logging; looked up once rather than per log event
+PROCESS_CONTEXT = {"host": socket.gethostname(), "pid": os.getpid(), "service": "arxiv-messaging"}
+
+def add_process_context(_logger, _method_name, event_dict):
+    """Add the precomputed host, pid and service fields to every log event"""
+    return {**PROCESS_CONTEXT, **event_dict}
+
+# orjson renders bytes, which go straight to stdout's binary buffer without a text re-encode
+if orjson:
+    log_renderer = structlog.processors.JSONRenderer(serializer=orjson.dumps)
+    log_factory = structlog.BytesLoggerFactory(sys.stdout.buffer)
+else:
+    log_renderer = structlog.processors.JSONRenderer()
+    log_factory = structlog.PrintLoggerFactory(file=sys.stdout)
+
+# Configure structured JSON logging, written straight to stdout rather than through stdlib logging
 structlog.configure(
     processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
+        add_process_context,
+        structlog.processors.add_log_level,
         structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
+        log_renderer
     ],
+    # Drop calls below INFO before an event dict is built or any processor runs
+    wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
     context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
+    logger_factory=log_factory,
     cache_logger_on_first_use=True,
 )
 
-logging.basicConfig(
-    format="%(message)s",
-    stream=None,
-    level=logging.INFO,
+logger = structlog.get_logger(__name__)
+# Bound once so the start-up paths reuse the same cached loggers
+pubsub_logger = logger.bind(component="pubsub")
+api_logger = logger.bind(component="api")
+
+@dataclass(frozen=True, slots=True)
+class ServiceConfig:
+    """Service settings, read from the environment once at start-up"""
+    project_id: Optional[str]
+    subscription_name: str
+    database_id: str
+    api_port: int
+    api_workers: int
+    service_mode: str  # combined, api-only, pubsub-only
+    
+    @classmethod
+    def from_env(cls) -> "ServiceConfig":
+        return cls(
+            project_id=os.getenv('GCP_PROJECT_ID'),
+            subscription_name=os.getenv('PUBSUB_SUBSCRIPTION_NAME', 'event-subscription'),
+            database_id=os.getenv('FIRESTORE_DATABASE_ID', 'messaging'),
+            api_port=int(os.getenv('PORT', 8080)),  # Cloud Run uses PORT env var
+            api_workers=int(os.getenv('WEB_CONCURRENCY', 1)),  # API worker processes
+            service_mode=os.getenv('SERVICE_MODE', 'combined')
+        )
+
+CONFIG = ServiceConfig.from_env()
+
+# uvicorn settings shared by every way the API is started
+UVICORN_OPTIONS = dict(
+    host="0.0.0.0",
+    loop="auto",  # uvloop when installed, otherwise asyncio
+    http="auto",  # httptools parser when installed, otherwise h11
+    ws="none",  # The API has no WebSocket endpoints
+    lifespan="on",  # Starts the API's handler threads before the first request
+    server_header=False,
+    log_config=None,  # Use our structured logging
+    access_log=False   # Disable uvicorn access logs
 )
 
-logger = structlog.get_logger(__name__)
+# Seconds the Pub/Sub processor gets to stop after SIGTERM before it is killed; well inside
+# Cloud Run's 10 second grace period, so the API's own shutdown still runs
+PUBSUB_STOP_TIMEOUT = 5
 
-def start_pubsub_processor(project_id: str, subscription_name: str, database_id: str):
-    """Start the Pub/Sub message processor in a separate thread"""
+# Fixed reply to liveness probes when the API server is not running
+HEALTH_RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 2\r\nConnection: close\r\n\r\nOK"
+
+def serve_health_checks(listener: socket.socket):
+    """Answer every connection with HEALTH_RESPONSE without parsing the request"""
+    while True:
+        conn, _ = listener.accept()
+        try:
+            conn.settimeout(5)
+            conn.recv(1024)
+            conn.sendall(HEALTH_RESPONSE)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+def start_health_server(port: int):
+    """Start a minimal health endpoint in a background thread"""
+    listener = socket.create_server(("0.0.0.0", port), backlog=128)
+    threading.Thread(target=serve_health_checks, args=(listener,), name="health-server", daemon=True).start()
+    logger.info("Started health server", port=port)
+
+def start_pubsub_processor(config: ServiceConfig):
+    """Start the Pub/Sub message processor, blocking until it is stopped"""
+    # Bound once so every event from the processor carries where it is reading from
+    log = pubsub_logger.bind(project_id=config.project_id,
+                             subscription_name=config.subscription_name,
+                             database_id=config.database_id)
     try:
-        logger.info("Starting Pub/Sub processor", 
-                   project_id=project_id,
-                   subscription_name=subscription_name,
-                   database_id=database_id)
+        log.info("Starting Pub/Sub processor")
         
-        system = EventAggregationSystem(project_id, subscription_name, database_id)
+        system = EventAggregationSystem(config.project_id, config.subscription_name, config.database_id)
+        # Stop pulling on SIGTERM or SIGINT and return once in-flight messages are handled
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda _signum, _frame: system.stop())
         system.start()  # This will block
         
     except Exception as e:
-        logger.error("Pub/Sub processor failed", error=str(e))
+        log.exception("Pub/Sub processor failed", error=str(e))
         sys.exit(1)
 
-def start_api_server(port: int):
-    """Start the FastAPI server"""
+def start_pubsub_process(config: ServiceConfig) -> multiprocessing.Process:
+    """Start the Pub/Sub processor in its own interpreter so it does not share the API's GIL"""
+    # Spawned rather than forked so the child creates its own gRPC channels
+    process = multiprocessing.get_context("spawn").Process(
+        target=start_pubsub_processor, args=(config,), name="pubsub-processor", daemon=True
+    )
+    process.start()
+    return process
+
+def stop_pubsub_process(process: multiprocessing.Process):
+    """Terminate the Pub/Sub processor, killing it if it has not stopped within PUBSUB_STOP_TIMEOUT"""
+    process.terminate()
+    process.join(PUBSUB_STOP_TIMEOUT)
+    if process.exitcode is None:
+        pubsub_logger.warning("Pub/Sub processor did not stop in time, killing it", timeout=PUBSUB_STOP_TIMEOUT)
+        process.kill()
+        process.join()
+
+def watch_pubsub_process(process: multiprocessing.Process, stopping: threading.Event, failed: threading.Event):
+    """Stop the API worker supervisor when the Pub/Sub processor exits on its own"""
+    multiprocessing.connection.wait([process.sentinel])
+    if stopping.is_set():
+        return  # Being stopped by main(), which reaps the child itself
+    process.join()
+    if process.exitcode != 0:
+        pubsub_logger.error("Pub/Sub processor exited", exitcode=process.exitcode)
+        failed.set()
+    # uvicorn's supervisor shuts its workers down on SIGTERM, as it does for Cloud Run's
+    signal.raise_signal(signal.SIGTERM)
+
+class CombinedServer(uvicorn.Server):
+    """API server that runs the Pub/Sub processor alongside it and stops both together"""
+    
+    def __init__(self, config: uvicorn.Config, service_config: ServiceConfig):
+        super().__init__(config)
+        self.service_config = service_config
+        self.stopping = False
+        self.pubsub_failed = False
+    
+    def _pubsub_stopped(self, process: multiprocessing.Process, stopped: asyncio.Event):
+        asyncio.get_running_loop().remove_reader(process.sentinel)
+        process.join()
+        stopped.set()
+        if not self.stopping and process.exitcode != 0:
+            pubsub_logger.error("Pub/Sub processor exited", exitcode=process.exitcode)
+            self.pubsub_failed = True
+        # The service is not useful without either half, so shut the API down too
+        self.should_exit = True
+    
+    async def serve(self, sockets=None):
+        process = start_pubsub_process(self.service_config)
+        stopped = asyncio.Event()
+        # The process sentinel becomes readable when the child exits, so the loop
+        # watches it directly instead of parking an executor thread in join()
+        loop = asyncio.get_running_loop()
+        loop.add_reader(process.sentinel, self._pubsub_stopped, process, stopped)
+        try:
+            await super().serve(sockets)
+        finally:
+            self.stopping = True
+            process.terminate()
+            try:
+                await asyncio.wait_for(stopped.wait(), PUBSUB_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                pubsub_logger.warning("Pub/Sub processor did not stop in time, killing it",
+                                      timeout=PUBSUB_STOP_TIMEOUT)
+                process.kill()
+                await stopped.wait()
+
+def start_combined(config: ServiceConfig):
+    """Start the FastAPI server with the Pub/Sub processor in a child process"""
     try:
-        logger.info("Starting FastAPI server", port=port)
+        api_logger.info("Starting FastAPI server", port=config.api_port)
+        server = CombinedServer(uvicorn.Config(app=app, port=config.api_port, **UVICORN_OPTIONS), config)
+        server.run()
         
-        # Configure uvicorn
-        config = uvicorn.Config(
-            app=app,
-            host="0.0.0.0", 
-            port=port,
-            log_config=None,  # Use our structured logging
-            access_log=False   # Disable uvicorn access logs
-        )
+    except Exception as e:
+        logger.exception("Combined service failed", error=str(e))
+        sys.exit(1)
+    
+    if server.pubsub_failed:
+        sys.exit(1)
+
+def start_api_server(config: ServiceConfig):
+    """Start the FastAPI server, in several worker processes when api_workers > 1"""
+    try:
+        api_logger.info("Starting FastAPI server", port=config.api_port, workers=config.api_workers)
         
-        server = uvicorn.Server(config)
+        if config.api_workers > 1:
+            # Each worker process imports the app itself; in combined mode the
+            # Pub/Sub processor keeps running once, in this supervising process
+            uvicorn.run("src.api:app", port=config.api_port, workers=config.api_workers, **UVICORN_OPTIONS)
+            return
+        
+        # Configure uvicorn
+        server = uvicorn.Server(uvicorn.Config(app=app, port=config.api_port, **UVICORN_OPTIONS))
         
-        # Run the server
-        asyncio.run(server.serve())
+        # Run the server on the configured event loop
+        server.run()
         
     except Exception as e:
-        logger.error("API server failed", error=str(e))
+        api_logger.exception("API server failed", error=str(e))
         sys.exit(1)
 
 def signal_handler(signum, _frame):
-    """Handle shutdown signals gracefully"""
+    """Handle shutdown signals gracefully
+
+    While uvicorn is serving it captures SIGTERM/SIGINT itself, drains open connections,
+    and re-raises the signal afterwards, so exiting here never interrupts a request.
+    """
     logger.info("Received shutdown signal", signal=signum)
     sys.exit(0)
 
@@ -84,46 +266,50 @@ def main():
     signal.signal(signal.SIGTERM, signal_handler)
     signal.signal(signal.SIGINT, signal_handler)
     
-    # Get configuration from environment variables
-    project_id = os.getenv('GCP_PROJECT_ID')
-    subscription_name = os.getenv('PUBSUB_SUBSCRIPTION_NAME', 'event-subscription')
-    database_id = os.getenv('FIRESTORE_DATABASE_ID', 'messaging')
-    api_port = int(os.getenv('PORT', 8080))  # Cloud Run uses PORT env var
+    config = CONFIG
     
-    if not project_id:
+    if not config.project_id:
         logger.error("Missing required environment variable", variable="GCP_PROJECT_ID")
         sys.exit(1)
     
     logger.info("Initializing arXiv Messaging Service", 
-               project_id=project_id,
-               subscription_name=subscription_name,
-               database_id=database_id,
-               api_port=api_port)
-    
-    # Determine service mode
-    service_mode = os.getenv('SERVICE_MODE', 'combined')  # combined, api-only, pubsub-only
+               project_id=config.project_id,
+               subscription_name=config.subscription_name,
+               database_id=config.database_id,
+               api_port=config.api_port,
+               api_workers=config.api_workers)
     
-    if service_mode == 'api-only':
+    if config.service_mode == 'api-only':
         logger.info("Starting in API-only mode")
-        start_api_server(api_port)
+        start_api_server(config)
         
-    elif service_mode == 'pubsub-only':
+    elif config.service_mode == 'pubsub-only':
         logger.info("Starting in Pub/Sub-only mode")
-        start_pubsub_processor(project_id, subscription_name, database_id)
+        # Cloud Run still expects the container to listen on PORT
+        start_health_server(config.api_port)
+        start_pubsub_processor(config)
         
     else:  # combined mode (default)
         logger.info("Starting in combined mode (API + Pub/Sub)")
         
-        # Start Pub/Sub processor in background thread
-        pubsub_thread = threading.Thread(
-            target=start_pubsub_processor,
-            args=(project_id, subscription_name, database_id),
-            daemon=True
-        )
-        pubsub_thread.start()
-        
-        # Start API server in main thread (this will block)
-        start_api_server(api_port)
+        if config.api_workers > 1:
+            # Start Pub/Sub processor alongside the API worker processes
+            pubsub_process = start_pubsub_process(config)
+            # uvicorn's supervisor loop blocks this thread, so the child is watched from another one
+            stopping = threading.Event()
+            pubsub_failed = threading.Event()
+            threading.Thread(target=watch_pubsub_process, args=(pubsub_process, stopping, pubsub_failed),
+                             name="pubsub-watcher", daemon=True).start()
+            
+            # Start API server workers (this will block)
+            start_api_server(config)
+            stopping.set()
+            stop_pubsub_process(pubsub_process)
+            if pubsub_failed.is_set():
+                sys.exit(1)
+        else:
+            # Serve the API and process Pub/Sub together, shutting both down on SIGTERM
+            start_combined(config)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
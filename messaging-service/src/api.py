@@ -3,12 +3,23 @@ FastAPI REST API for managing undelivered messages
 """
 
 from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 from datetime import datetime
+from contextlib import asynccontextmanager
+import anyio
+import functools
+import json
 import structlog
 import os
+import threading
+
+try:
+    import orjson
+except ImportError:  # Rendering falls back to the standard json module
+    orjson = None
 
 from .message_server import EventStore, DeliveryService, EventAggregator
 from arxiv_messaging import Event, EventType, Subscription, DeliveryMethod, AggregationFrequency, AggregationMethod, DeliveryErrorStrategy
@@ -16,12 +27,48 @@ from arxiv_messaging import Event, EventType, Subscription, DeliveryMethod, Aggr
 # Configure structured logging
 logger = structlog.get_logger(__name__)
 
+def _json_default(obj):
+    """Serialize values orjson does not handle natively, such as Firestore's datetime subclass"""
+    if isinstance(obj, datetime):
+        # UTC is written as "Z", as the pydantic response models did
+        text = obj.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered in a single pass, with orjson when it is installed"""
+    
+    def render(self, content: Any) -> bytes:
+        if orjson:
+            return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+        return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Worker threads running the synchronous route handlers, per API process
+THREAD_POOL_SIZE = int(os.getenv('THREAD_POOL_SIZE', '16'))
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Size the thread pool the synchronous handlers run in and start its threads before serving"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_POOL_SIZE
+    # Each call holds its thread at the barrier, so anyio has to start a new thread for every call
+    barrier = threading.Barrier(THREAD_POOL_SIZE)
+    async with anyio.create_task_group() as task_group:
+        for _ in range(THREAD_POOL_SIZE):
+            task_group.start_soon(anyio.to_thread.run_sync, barrier.wait)
+    logger.info("API thread pool started", threads=THREAD_POOL_SIZE)
+    yield
+
 app = FastAPI(
     title="arXiv Messaging Service API",
     description="REST API for managing undelivered messages and user subscriptions",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+# Message and user listings are repetitive JSON that compresses well
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Pydantic models for API responses
 class UserStats(BaseModel):
     user_id: str
@@ -103,31 +150,79 @@ class UpdateSubscriptionRequest(BaseModel):
     slack_webhook_url: Optional[str] = None
     enabled: Optional[bool] = None
 
+# Endpoints return these payloads in a FastJSONResponse directly, skipping
+# response_model validation and jsonable_encoder for data the EventStore already produced
+def _event_payload(event: Event) -> Dict[str, Any]:
+    """Build the EventResponse JSON for an event"""
+    return {
+        "event_id": event.event_id,
+        "user_id": event.user_id,
+        "event_type": event.event_type.value,
+        "message": event.message,
+        "sender": event.sender,
+        "subject": event.subject,
+        "timestamp": event.timestamp,
+        "metadata": event.metadata
+    }
+
+def _subscription_payload(sub: Subscription) -> Dict[str, Any]:
+    """Build the SubscriptionResponse JSON for a subscription"""
+    return {
+        "subscription_id": sub.subscription_id,
+        "user_id": sub.user_id,
+        "delivery_method": sub.delivery_method.value,
+        "aggregation_frequency": sub.aggregation_frequency.value,
+        "aggregation_method": sub.aggregation_method.value,
+        "delivery_error_strategy": sub.delivery_error_strategy.value,
+        "delivery_time": sub.delivery_time,
+        "timezone": sub.timezone,
+        "email_address": sub.email_address,
+        "slack_webhook_url": sub.slack_webhook_url,
+        "enabled": sub.enabled
+    }
+
+# Services are created on first use and shared by all requests, so the Firestore
+# client and its gRPC channel are set up once per process rather than per request
+@functools.lru_cache(maxsize=4)
+def _create_event_store(project_id: str, database_id: str) -> EventStore:
+    return EventStore(project_id, database_id)
+
+@functools.lru_cache(maxsize=1)
+def get_delivery_service() -> DeliveryService:
+    """Get the shared DeliveryService instance"""
+    return DeliveryService()
+
+@functools.lru_cache(maxsize=4)
+def get_aggregator(event_store: EventStore) -> EventAggregator:
+    """Get the shared EventAggregator for an EventStore"""
+    return EventAggregator(event_store)
+
 # Dependency injection for services
 async def get_event_store() -> EventStore:
-    """Get EventStore instance"""
+    """Get the shared EventStore instance"""
     project_id = os.getenv('GCP_PROJECT_ID')
     database_id = os.getenv('FIRESTORE_DATABASE_ID', 'messaging')
     
     if not project_id:
         raise HTTPException(status_code=500, detail="GCP_PROJECT_ID not configured")
     
-    return EventStore(project_id, database_id)
+    return _create_event_store(project_id, database_id)
 
 async def get_services():
     """Get all required services"""
     event_store = await get_event_store()
-    delivery_service = DeliveryService()
-    aggregator = EventAggregator(event_store)
-    return event_store, delivery_service, aggregator
+    return event_store, get_delivery_service(), get_aggregator(event_store)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "arxiv-messaging-api"}
 
+# Handlers below call the synchronous Firestore client, so they are plain functions that FastAPI
+# runs in its thread pool; as coroutines they would block the event loop for every query. That pool,
+# sized by THREAD_POOL_SIZE in lifespan(), is what limits concurrent requests in each API process.
 @app.get("/users", response_model=List[UserStats])
-async def list_users(
+def list_users(
     event_store: EventStore = Depends(get_event_store),
     include_empty: bool = Query(False, description="Include users with no undelivered messages")
 ):
@@ -135,7 +230,7 @@ async def list_users(
     1st endpoint: List all users with their subscription and undelivered message counts
     """
     try:
-        logger.info("API: Listing users", include_empty=include_empty)
+        logger.debug("API: Listing users", include_empty=include_empty)
         
         # Get all undelivered events grouped by user
         undelivered_events = event_store.get_undelivered_events()
@@ -152,11 +247,13 @@ async def list_users(
             # For now, we'll work with users who have undelivered messages
             pass
         
+        # Read every user's subscriptions in batched queries rather than one query per user
+        subscriptions_by_user = event_store.get_user_subscriptions_bulk(list(all_users))
+        
         user_stats = []
         for user_id in all_users:
             try:
-                # Get user subscriptions
-                subscriptions = event_store.get_user_subscriptions(user_id)
+                subscriptions = subscriptions_by_user.get(user_id, [])
                 enabled_subs = [sub for sub in subscriptions if sub.enabled]
                 
                 undelivered_count = len(undelivered_events.get(user_id, []))
@@ -165,72 +262,65 @@ async def list_users(
                 if not include_empty and undelivered_count == 0:
                     continue
                 
-                user_stats.append(UserStats(
-                    user_id=user_id,
-                    subscription_count=len(subscriptions),
-                    undelivered_count=undelivered_count,
-                    enabled_subscriptions=len(enabled_subs)
-                ))
+                user_stats.append({
+                    "user_id": user_id,
+                    "subscription_count": len(subscriptions),
+                    "undelivered_count": undelivered_count,
+                    "enabled_subscriptions": len(enabled_subs)
+                })
                 
             except Exception as e:
                 logger.warning("Error getting stats for user", user_id=user_id, error=str(e))
                 continue
         
-        logger.info("API: Listed users", total_users=len(user_stats))
-        return user_stats
+        logger.debug("API: Listed users", total_users=len(user_stats))
+        return FastJSONResponse(user_stats)
         
     except Exception as e:
         logger.error("API: Failed to list users", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to list users: {str(e)}")
 
 @app.get("/users/{user_id}/messages", response_model=List[EventResponse])
-async def get_user_messages(
+def get_user_messages(
     user_id: str,
     event_store: EventStore = Depends(get_event_store),
     limit: Optional[int] = Query(None, description="Maximum number of messages to return"),
-    event_type: Optional[str] = Query(None, description="Filter by event type")
+    event_type: Optional[str] = Query(None, description="Filter by event type"),
+    page_size: Optional[int] = Query(None, gt=0, description="Page through messages instead of applying limit; "
+                                                          "the next page's cursor is returned in the X-Next-Cursor header"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header")
 ):
     """
     2nd endpoint: Get undelivered messages for a specific user
     """
     try:
-        logger.info("API: Getting user messages", 
-                   user_id=user_id, limit=limit, event_type=event_type)
+        logger.debug("API: Getting user messages", 
+                   user_id=user_id, limit=limit, event_type=event_type, page_size=page_size, cursor=cursor)
+        
+        # Stored event types are upper case
+        wanted_type = event_type.upper() if event_type else None
+        
+        if page_size:
+            events, next_cursor = event_store.get_undelivered_events_page(
+                page_size, cursor, user_id=user_id, event_type=wanted_type
+            )
+            response = FastJSONResponse([_event_payload(event) for event in events])
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response
         
         events = event_store.get_undelivered_events_by_user(user_id)
         
         if not events:
-            return []
+            return FastJSONResponse([])
         
-        # Apply filters
-        filtered_events = []
-        for event in events:
-            # Apply event type filter if specified
-            if event_type and event.event_type.value != event_type.upper():
-                continue
-            filtered_events.append(event)
-            
-            # Apply limit
-            if limit and len(filtered_events) >= limit:
-                break
+        # Apply the event type filter, then the limit
+        matching_events = [event for event in events if not wanted_type or event.event_type.value == wanted_type]
+        event_responses = [_event_payload(event) for event in matching_events[:limit or None]]
         
-        event_responses = [
-            EventResponse(
-                event_id=event.event_id,
-                user_id=event.user_id,
-                event_type=event.event_type.value,
-                message=event.message,
-                sender=event.sender,
-                subject=event.subject,
-                timestamp=event.timestamp,
-                metadata=event.metadata
-            )
-            for event in filtered_events
-        ]
-        
-        logger.info("API: Retrieved user messages", 
+        logger.debug("API: Retrieved user messages", 
                    user_id=user_id, message_count=len(event_responses))
-        return event_responses
+        return FastJSONResponse(event_responses)
         
     except Exception as e:
         logger.error("API: Failed to get user messages", 
@@ -238,83 +328,77 @@ async def get_user_messages(
         raise HTTPException(status_code=500, detail=f"Failed to get messages for user: {str(e)}")
 
 @app.get("/undelivered", response_model=List[EventResponse])
-async def list_all_undelivered_messages(
+def list_all_undelivered_messages(
     event_store: EventStore = Depends(get_event_store),
     limit: Optional[int] = Query(100, description="Maximum number of events to return"),
-    event_type: Optional[str] = Query(None, description="Filter by event type")
+    event_type: Optional[str] = Query(None, description="Filter by event type"),
+    page_size: Optional[int] = Query(None, gt=0, description="Page through events instead of applying limit; "
+                                                          "the next page's cursor is returned in the X-Next-Cursor header"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header")
 ):
     """
     List all undelivered messages across all users (for admin/monitoring)
     """
     try:
-        logger.info("API: Listing all undelivered messages", 
-                   limit=limit, event_type=event_type)
+        logger.debug("API: Listing all undelivered messages", 
+                   limit=limit, event_type=event_type, page_size=page_size, cursor=cursor)
         
-        # Get all undelivered events
-        undelivered_events = event_store.get_undelivered_events(limit)
+        # Stored event types are upper case
+        wanted_type = event_type.upper() if event_type else None
         
-        # Convert to response format
-        event_responses = []
-        total_processed = 0
+        if page_size:
+            events, next_cursor = event_store.get_undelivered_events_page(
+                page_size, cursor, event_type=wanted_type
+            )
+            response = FastJSONResponse([_event_payload(event) for event in events])
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response
+
+        # The query applies both the event type filter and the limit
+        undelivered_events = event_store.get_undelivered_events(limit, wanted_type)
         
-        for uid, events in undelivered_events.items():
-            for event in events:
-                # Apply event type filter if specified
-                if event_type and event.event_type.value != event_type.upper():
-                    continue
-                
-                # Apply limit
-                if limit and total_processed >= limit:
-                    break
-                    
-                event_responses.append(EventResponse(
-                    event_id=event.event_id,
-                    user_id=event.user_id,
-                    event_type=event.event_type.value,
-                    message=event.message,
-                    sender=event.sender,
-                    subject=event.subject,
-                    timestamp=event.timestamp,
-                    metadata=event.metadata
-                ))
-                total_processed += 1
-            
-            if limit and total_processed >= limit:
-                break
+        # Convert to response format
+        event_responses = [
+            _event_payload(event)
+            for events in undelivered_events.values()
+            for event in events
+        ]
         
-        logger.info("API: Listed all undelivered messages", 
+        logger.debug("API: Listed all undelivered messages", 
                    total_events=len(event_responses))
-        return event_responses
+        return FastJSONResponse(event_responses)
         
     except Exception as e:
         logger.error("API: Failed to list all undelivered messages", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to list undelivered messages: {str(e)}")
 
 @app.get("/undelivered/stats", response_model=UndeliveredStats)
-async def get_undelivered_stats(
+def get_undelivered_stats(
     event_store: EventStore = Depends(get_event_store)
 ):
     """
     Get statistics about undelivered messages
     """
     try:
-        logger.info("API: Getting undelivered stats")
+        logger.debug("API: Getting undelivered stats")
         
         stats = event_store.get_undelivered_stats()
         
-        return UndeliveredStats(
-            total_users_with_undelivered=stats.get('total_users_with_undelivered', 0),
-            total_undelivered_events=stats.get('total_undelivered_events', 0),
-            users_with_counts=stats.get('users_with_counts', {}),
-            events_by_type=stats.get('events_by_type', {})
-        )
+        # users_with_counts has an entry per user, so skip validating it field by field
+        return FastJSONResponse({
+            "total_users_with_undelivered": stats.get('total_users_with_undelivered', 0),
+            "total_undelivered_events": stats.get('total_undelivered_events', 0),
+            "users_with_counts": stats.get('users_with_counts', {}),
+            "events_by_type": stats.get('events_by_type', {})
+        })
         
     except Exception as e:
         logger.error("API: Failed to get undelivered stats", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
 @app.post("/flush", response_model=FlushResponse)
-async def flush_messages(
+def flush_messages(
     request: FlushRequest,
     event_store: EventStore = Depends(get_event_store)
 ):
@@ -322,21 +406,14 @@ async def flush_messages(
     3rd endpoint: Flush undelivered messages
     """
     try:
-        logger.info("API: Flushing messages", 
+        logger.debug("API: Flushing messages", 
                    user_id=request.user_id, 
                    force_delivery=request.force_delivery,
                    dry_run=request.dry_run)
         
         if request.dry_run:
-            # Dry run - just return what would be processed
-            if request.user_id:
-                events = event_store.get_undelivered_events_by_user(request.user_id)
-                undelivered_events = {request.user_id: events} if events else {}
-            else:
-                undelivered_events = event_store.get_undelivered_events()
-            
-            users_processed = len(undelivered_events)
-            total_events = sum(len(events) for events in undelivered_events.values())
+            # Dry run - just count what would be processed
+            users_processed, total_events = event_store.count_undelivered(request.user_id)
             
             return FlushResponse(
                 users_processed=users_processed,
@@ -348,12 +425,9 @@ async def flush_messages(
             )
         
         # Actual flush
-        delivery_service = DeliveryService()
-        aggregator = EventAggregator(event_store)
-        
         results = event_store.flush_undelivered_messages(
-            delivery_service=delivery_service,
-            aggregator=aggregator,
+            delivery_service=get_delivery_service(),
+            aggregator=get_aggregator(event_store),
             user_id=request.user_id,
             force_delivery=request.force_delivery
         )
@@ -374,7 +448,7 @@ async def flush_messages(
         raise HTTPException(status_code=500, detail=f"Failed to flush messages: {str(e)}")
 
 @app.get("/users/{user_id}/messages/{message_id}", response_model=EventResponse)
-async def get_user_message(
+def get_user_message(
     user_id: str,
     message_id: str,
     event_store: EventStore = Depends(get_event_store)
@@ -383,37 +457,21 @@ async def get_user_message(
     4th endpoint: Get a specific message for a user
     """
     try:
-        logger.info("API: Getting specific user message", 
+        logger.debug("API: Getting specific user message", 
                    user_id=user_id, message_id=message_id)
         
-        # Get all events for user to find the specific message
-        events = event_store.get_undelivered_events_by_user(user_id)
-        
-        # Find the specific message
-        target_event = None
-        for event in events:
-            if event.event_id == message_id:
-                target_event = event
-                break
+        # Look the message up directly and check it belongs to this user
+        target_event = event_store.get_event_by_id(message_id)
         
-        if not target_event:
+        if not target_event or target_event.user_id != user_id:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Message {message_id} not found for user {user_id}"
             )
         
-        response = EventResponse(
-            event_id=target_event.event_id,
-            user_id=target_event.user_id,
-            event_type=target_event.event_type.value,
-            message=target_event.message,
-            sender=target_event.sender,
-            subject=target_event.subject,
-            timestamp=target_event.timestamp,
-            metadata=target_event.metadata
-        )
+        response = FastJSONResponse(_event_payload(target_event))
         
-        logger.info("API: Retrieved specific user message", 
+        logger.debug("API: Retrieved specific user message", 
                    user_id=user_id, message_id=message_id)
         return response
         
@@ -425,7 +483,7 @@ async def get_user_message(
         raise HTTPException(status_code=500, detail=f"Failed to get message: {str(e)}")
 
 @app.delete("/users/{user_id}/messages/{message_id}")
-async def delete_user_message(
+def delete_user_message(
     user_id: str,
     message_id: str,
     event_store: EventStore = Depends(get_event_store)
@@ -434,28 +492,16 @@ async def delete_user_message(
     5th endpoint: Delete a specific message for a user
     """
     try:
-        logger.info("API: Deleting specific user message", 
+        logger.debug("API: Deleting specific user message", 
                    user_id=user_id, message_id=message_id)
         
-        # First verify the message belongs to this user
-        events = event_store.get_undelivered_events_by_user(user_id)
-        message_found = any(event.event_id == message_id for event in events)
-        
-        if not message_found:
+        # Ownership is checked in the same transaction as the delete
+        if not event_store.delete_event_if_owned(message_id, user_id):
             raise HTTPException(
                 status_code=404, 
                 detail=f"Message {message_id} not found for user {user_id}"
             )
         
-        # Delete the specific event
-        success = event_store.delete_event_by_id(message_id)
-        
-        if not success:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Failed to delete message {message_id}"
-            )
-        
         logger.info("API: Deleted specific user message", 
                    user_id=user_id, message_id=message_id)
         
@@ -473,7 +519,7 @@ async def delete_user_message(
         raise HTTPException(status_code=500, detail=f"Failed to delete message: {str(e)}")
 
 @app.delete("/users/{user_id}/messages")
-async def delete_user_messages(
+def delete_user_messages(
     user_id: str,
     event_store: EventStore = Depends(get_event_store),
     before_timestamp: Optional[datetime] = Query(None, description="Delete messages before this timestamp")
@@ -482,7 +528,7 @@ async def delete_user_messages(
     Delete all messages for a user, optionally before a specific timestamp
     """
     try:
-        logger.info("API: Deleting user messages", 
+        logger.debug("API: Deleting user messages", 
                    user_id=user_id, before_timestamp=before_timestamp)
         
         if before_timestamp:
@@ -491,7 +537,7 @@ async def delete_user_messages(
             message = f"Messages deleted for user {user_id} before {before_timestamp}"
         else:
             # Delete all messages for user
-            event_store.clear_user_events(user_id, datetime.now())
+            event_store.clear_user_events(user_id)
             message = f"All messages deleted for user {user_id}"
         
         logger.info("API: Deleted user messages", 
@@ -509,7 +555,7 @@ async def delete_user_messages(
         raise HTTPException(status_code=500, detail=f"Failed to delete messages: {str(e)}")
 
 @app.delete("/undelivered", response_model=DeleteResponse)
-async def delete_messages(
+def delete_messages(
     request: DeleteRequest,
     event_store: EventStore = Depends(get_event_store)
 ):
@@ -517,7 +563,7 @@ async def delete_messages(
     5th endpoint: Delete undelivered messages
     """
     try:
-        logger.info("API: Deleting messages", 
+        logger.debug("API: Deleting messages", 
                    user_id=request.user_id,
                    event_ids=request.event_ids,
                    before_timestamp=request.before_timestamp)
@@ -538,10 +584,8 @@ async def delete_messages(
         elif request.user_id and request.before_timestamp:
             # Delete events for specific user before timestamp
             try:
-                event_store.clear_user_events(request.user_id, request.before_timestamp)
+                events_deleted = event_store.clear_user_events(request.user_id, request.before_timestamp)
                 users_affected.add(request.user_id)
-                # We don't have an exact count, so we'll estimate
-                events_deleted = 1  # Placeholder
             except Exception as e:
                 logger.error("Failed to clear user events", 
                            user_id=request.user_id, error=str(e))
@@ -550,9 +594,8 @@ async def delete_messages(
         elif request.user_id:
             # Delete all events for specific user
             try:
-                event_store.clear_user_events(request.user_id, datetime.now())
+                events_deleted = event_store.clear_user_events(request.user_id)
                 users_affected.add(request.user_id)
-                events_deleted = 1  # Placeholder
             except Exception as e:
                 logger.error("Failed to clear user events", 
                            user_id=request.user_id, error=str(e))
@@ -590,7 +633,7 @@ async def delete_messages(
 # Subscription Management Endpoints
 
 @app.get("/users/{user_id}/subscriptions", response_model=List[SubscriptionResponse])
-async def get_user_subscriptions(
+def get_user_subscriptions(
     user_id: str,
     event_store: EventStore = Depends(get_event_store)
 ):
@@ -598,30 +641,15 @@ async def get_user_subscriptions(
     Get all subscriptions for a user
     """
     try:
-        logger.info("API: Getting user subscriptions", user_id=user_id)
+        logger.debug("API: Getting user subscriptions", user_id=user_id)
         
         subscriptions = event_store.get_user_subscriptions(user_id)
         
-        subscription_responses = [
-            SubscriptionResponse(
-                subscription_id=sub.subscription_id,
-                user_id=sub.user_id,
-                delivery_method=sub.delivery_method.value,
-                aggregation_frequency=sub.aggregation_frequency.value,
-                aggregation_method=sub.aggregation_method.value,
-                delivery_error_strategy=sub.delivery_error_strategy.value,
-                delivery_time=sub.delivery_time,
-                timezone=sub.timezone,
-                email_address=sub.email_address,
-                slack_webhook_url=sub.slack_webhook_url,
-                enabled=sub.enabled
-            )
-            for sub in subscriptions
-        ]
+        subscription_responses = [_subscription_payload(sub) for sub in subscriptions]
         
-        logger.info("API: Retrieved user subscriptions", 
+        logger.debug("API: Retrieved user subscriptions", 
                    user_id=user_id, subscription_count=len(subscription_responses))
-        return subscription_responses
+        return FastJSONResponse(subscription_responses)
         
     except Exception as e:
         logger.error("API: Failed to get user subscriptions", 
@@ -629,7 +657,7 @@ async def get_user_subscriptions(
         raise HTTPException(status_code=500, detail=f"Failed to get subscriptions: {str(e)}")
 
 @app.post("/users/{user_id}/subscriptions", response_model=SubscriptionResponse)
-async def create_user_subscription(
+def create_user_subscription(
     user_id: str,
     request: CreateSubscriptionRequest,
     event_store: EventStore = Depends(get_event_store)
@@ -638,7 +666,7 @@ async def create_user_subscription(
     Create a new subscription for a user
     """
     try:
-        logger.info("API: Creating user subscription", user_id=user_id)
+        logger.debug("API: Creating user subscription", user_id=user_id)
         
         # Validate that user_id in path matches request
         if user_id != request.user_id:
@@ -681,19 +709,7 @@ async def create_user_subscription(
         # Store subscription
         event_store.store_subscription(subscription)
         
-        response = SubscriptionResponse(
-            subscription_id=subscription.subscription_id,
-            user_id=subscription.user_id,
-            delivery_method=subscription.delivery_method.value,
-            aggregation_frequency=subscription.aggregation_frequency.value,
-            aggregation_method=subscription.aggregation_method.value,
-            delivery_error_strategy=subscription.delivery_error_strategy.value,
-            delivery_time=subscription.delivery_time,
-            timezone=subscription.timezone,
-            email_address=subscription.email_address,
-            slack_webhook_url=subscription.slack_webhook_url,
-            enabled=subscription.enabled
-        )
+        response = FastJSONResponse(_subscription_payload(subscription))
         
         logger.info("API: Created user subscription", 
                    user_id=user_id, subscription_id=subscription_id)
@@ -709,7 +725,7 @@ async def create_user_subscription(
         raise HTTPException(status_code=500, detail=f"Failed to create subscription: {str(e)}")
 
 @app.get("/users/{user_id}/subscriptions/{subscription_id}", response_model=SubscriptionResponse)
-async def get_user_subscription(
+def get_user_subscription(
     user_id: str,
     subscription_id: str,
     event_store: EventStore = Depends(get_event_store)
@@ -718,7 +734,7 @@ async def get_user_subscription(
     Get a specific subscription for a user
     """
     try:
-        logger.info("API: Getting specific user subscription", 
+        logger.debug("API: Getting specific user subscription", 
                    user_id=user_id, subscription_id=subscription_id)
         
         subscriptions = event_store.get_user_subscriptions(user_id)
@@ -736,21 +752,9 @@ async def get_user_subscription(
                 detail=f"Subscription {subscription_id} not found for user {user_id}"
             )
         
-        response = SubscriptionResponse(
-            subscription_id=target_subscription.subscription_id,
-            user_id=target_subscription.user_id,
-            delivery_method=target_subscription.delivery_method.value,
-            aggregation_frequency=target_subscription.aggregation_frequency.value,
-            aggregation_method=target_subscription.aggregation_method.value,
-            delivery_error_strategy=target_subscription.delivery_error_strategy.value,
-            delivery_time=target_subscription.delivery_time,
-            timezone=target_subscription.timezone,
-            email_address=target_subscription.email_address,
-            slack_webhook_url=target_subscription.slack_webhook_url,
-            enabled=target_subscription.enabled
-        )
+        response = FastJSONResponse(_subscription_payload(target_subscription))
         
-        logger.info("API: Retrieved specific user subscription", 
+        logger.debug("API: Retrieved specific user subscription", 
                    user_id=user_id, subscription_id=subscription_id)
         return response
         
@@ -762,7 +766,7 @@ async def get_user_subscription(
         raise HTTPException(status_code=500, detail=f"Failed to get subscription: {str(e)}")
 
 @app.put("/users/{user_id}/subscriptions/{subscription_id}", response_model=SubscriptionResponse)
-async def update_user_subscription(
+def update_user_subscription(
     user_id: str,
     subscription_id: str,
     request: UpdateSubscriptionRequest,
@@ -772,7 +776,7 @@ async def update_user_subscription(
     Update a specific subscription for a user
     """
     try:
-        logger.info("API: Updating user subscription", 
+        logger.debug("API: Updating user subscription", 
                    user_id=user_id, subscription_id=subscription_id)
         
         # Get existing subscription
@@ -825,19 +829,7 @@ async def update_user_subscription(
         # Store updated subscription
         event_store.store_subscription(target_subscription)
         
-        response = SubscriptionResponse(
-            subscription_id=target_subscription.subscription_id,
-            user_id=target_subscription.user_id,
-            delivery_method=target_subscription.delivery_method.value,
-            aggregation_frequency=target_subscription.aggregation_frequency.value,
-            aggregation_method=target_subscription.aggregation_method.value,
-            delivery_error_strategy=target_subscription.delivery_error_strategy.value,
-            delivery_time=target_subscription.delivery_time,
-            timezone=target_subscription.timezone,
-            email_address=target_subscription.email_address,
-            slack_webhook_url=target_subscription.slack_webhook_url,
-            enabled=target_subscription.enabled
-        )
+        response = FastJSONResponse(_subscription_payload(target_subscription))
         
         logger.info("API: Updated user subscription", 
                    user_id=user_id, subscription_id=subscription_id)
@@ -855,7 +847,7 @@ async def update_user_subscription(
         raise HTTPException(status_code=500, detail=f"Failed to update subscription: {str(e)}")
 
 @app.delete("/users/{user_id}/subscriptions/{subscription_id}")
-async def delete_user_subscription(
+def delete_user_subscription(
     user_id: str,
     subscription_id: str,
     event_store: EventStore = Depends(get_event_store)
@@ -864,7 +856,7 @@ async def delete_user_subscription(
     Delete a specific subscription for a user
     """
     try:
-        logger.info("API: Deleting user subscription", 
+        logger.debug("API: Deleting user subscription", 
                    user_id=user_id, subscription_id=subscription_id)
         
         # Verify the subscription exists and belongs to the user
@@ -13,6 +13,8 @@ from typing import Optional, Union
 import structlog
 
 logger = structlog.get_logger(__name__)
+# Used by send_email when the caller does not pass a logger
+default_logger = logger
 
 
 def _can_encode_as_ascii(text: str) -> bool:
@@ -66,7 +68,7 @@ def send_email(
         bool: True if email sent successfully, False otherwise
     """
     if logger is None:
-        logger = structlog.get_logger(__name__)
+        logger = default_logger
     
     try:
         # Use email policy that prefers 8bit/quoted-printable encoding over base64
@@ -5,15 +5,17 @@ from enum import Enum
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import html
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, asdict, replace
 from abc import ABC, abstractmethod
 import threading
 import time
 from google.cloud import pubsub_v1
 from google.cloud import firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
 import schedule
+from cachetools import TTLCache
 import os
 import structlog
 import httpx
@@ -24,9 +26,7 @@ from arxiv_messaging import EventType, DeliveryMethod, AggregationFrequency, Agg
 structlog.configure(
     processors=[
         structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
@@ -47,6 +47,9 @@ logging.basicConfig(
 
 logger = structlog.get_logger(__name__)
 
+# Seconds a user's subscriptions are served from memory before being read from Firestore again
+SUBSCRIPTIONS_CACHE_TTL = int(os.environ.get('SUBSCRIPTIONS_CACHE_TTL', '60'))
+
 
 @dataclass
 class AggregatedEvent:
@@ -236,7 +239,8 @@ class DeliveryService:
 class EventStore:
     """Handles event storage and retrieval using Firestore"""
     
-    def __init__(self, project_id: Optional[str] = None, database_id: str = "messaging"):
+    def __init__(self, project_id: Optional[str] = None, database_id: str = "messaging",
+                 cache_subscriptions: bool = True):
         # Initialize Firestore client
         if not project_id:
             project_id = os.getenv('GCP_PROJECT_ID')
@@ -256,6 +260,17 @@ class EventStore:
         self.subscriptions_collection = 'subscriptions'
         # Keep old collection name for backward compatibility during migration
         self.preferences_collection = 'user_preferences'
+        # Subscriptions per user, shared by the threads of one process; changes made through this
+        # store invalidate them, changes made elsewhere (including the API, which runs in another
+        # process than the Pub/Sub processor) show up within the TTL. Delivery turns this off so
+        # that it always sees current subscriptions.
+        self.cache_subscriptions = cache_subscriptions
+        self._subscriptions_cache = TTLCache(maxsize=10_000, ttl=SUBSCRIPTIONS_CACHE_TTL)
+        self._subscriptions_cache_lock = threading.Lock()
+    
+    def _invalidate_subscriptions(self, user_id: str):
+        with self._subscriptions_cache_lock:
+            self._subscriptions_cache.pop(user_id, None)
     
     def store_event(self, event: Event):
         """Store an individual event"""
@@ -330,13 +345,16 @@ class EventStore:
                         error=str(e))
             return []
     
-    def clear_user_events(self, user_id: str, before: datetime):
-        """Clear events for a user before a specific time"""
+    def clear_user_events(self, user_id: str, before: Optional[datetime] = None) -> int:
+        """Clear events for a user before a specific time, or all of them when no time is given
+
+        Returns the number of events deleted.
+        """
         try:
             # Query events to delete
-            query = (self.db.collection(self.events_collection)
-                    .where(filter=FieldFilter('user_id', '==', user_id))
-                    .where(filter=FieldFilter('timestamp', '<', before)))
+            query = self.db.collection(self.events_collection).where(filter=FieldFilter('user_id', '==', user_id))
+            if before is not None:
+                query = query.where(filter=FieldFilter('timestamp', '<', before))
             
             # Delete events in batches
             batch = self.db.batch()
@@ -359,7 +377,8 @@ class EventStore:
             logger.info("Events cleared for user",
                        user_id=user_id,
                        events_cleared=count,
-                       before_timestamp=before.isoformat())
+                       before_timestamp=before.isoformat() if before else None)
+            return count
             
         except Exception as e:
             logger.error("Failed to clear events for user",
@@ -381,6 +400,7 @@ class EventStore:
             # Store in Firestore using subscription_id as document ID
             doc_ref = self.db.collection(self.subscriptions_collection).document(subscription.subscription_id)
             doc_ref.set(subscription_dict)
+            self._invalidate_subscriptions(subscription.user_id)
             
             logger.info("Subscription stored",
                        subscription_id=subscription.subscription_id,
@@ -403,31 +423,50 @@ class EventStore:
             preference.subscription_id = f"{preference.user_id}-{preference.delivery_method.value}"
         return self.store_subscription(preference)
     
+    def _subscription_from_doc(self, doc) -> Subscription:
+        """Convert a stored subscription document back into a Subscription"""
+        data = doc.to_dict()
+        return Subscription(
+            subscription_id=data.get('subscription_id', doc.id),
+            user_id=data['user_id'],
+            delivery_method=DeliveryMethod(data['delivery_method']),
+            aggregation_frequency=AggregationFrequency(data['aggregation_frequency']),
+            aggregation_method=AggregationMethod(data.get('aggregation_method', 'plain')),
+            delivery_error_strategy=DeliveryErrorStrategy(data.get('delivery_error_strategy', 'retry')),
+            delivery_time=data.get('delivery_time', '09:00'),
+            timezone=data.get('timezone', 'UTC'),
+            email_address=data.get('email_address'),
+            slack_webhook_url=data.get('slack_webhook_url'),
+            enabled=data.get('enabled', True)
+        )
+
+    def _get_cached_subscriptions(self, user_id: str) -> Optional[List[Subscription]]:
+        if not self.cache_subscriptions:
+            return None
+        with self._subscriptions_cache_lock:
+            cached = self._subscriptions_cache.get(user_id)
+        # Copies, as callers update subscriptions in place before storing them
+        return [replace(subscription) for subscription in cached] if cached is not None else None
+
+    def _cache_subscriptions(self, user_id: str, subscriptions: List[Subscription]):
+        # Users without subscriptions are not cached, so a newly created one applies at once
+        if not self.cache_subscriptions or not subscriptions:
+            return
+        with self._subscriptions_cache_lock:
+            self._subscriptions_cache[user_id] = [replace(subscription) for subscription in subscriptions]
+
     def get_user_subscriptions(self, user_id: str) -> List[Subscription]:
         """Retrieve all subscriptions for a user"""
+        cached = self._get_cached_subscriptions(user_id)
+        if cached is not None:
+            return cached
+        
         try:
             # Query subscriptions collection for this user
             query = self.db.collection(self.subscriptions_collection).where(filter=FieldFilter('user_id', '==', user_id)).where(filter=FieldFilter('enabled', '==', True))
-            docs = query.stream()
-            
-            subscriptions = []
-            for doc in docs:
-                data = doc.to_dict()
-                subscription = Subscription(
-                    subscription_id=data.get('subscription_id', doc.id),
-                    user_id=data['user_id'],
-                    delivery_method=DeliveryMethod(data['delivery_method']),
-                    aggregation_frequency=AggregationFrequency(data['aggregation_frequency']),
-                    aggregation_method=AggregationMethod(data.get('aggregation_method', 'plain')),
-                    delivery_error_strategy=DeliveryErrorStrategy(data.get('delivery_error_strategy', 'retry')),
-                    delivery_time=data.get('delivery_time', '09:00'),
-                    timezone=data.get('timezone', 'UTC'),
-                    email_address=data.get('email_address'),
-                        slack_webhook_url=data.get('slack_webhook_url'),
-                    enabled=data.get('enabled', True)
-                )
-                subscriptions.append(subscription)
+            subscriptions = [self._subscription_from_doc(doc) for doc in query.stream()]
             
+            self._cache_subscriptions(user_id, subscriptions)
             return subscriptions
             
         except Exception as e:
@@ -436,6 +475,39 @@ class EventStore:
                         error=str(e))
             return []
 
+    def get_user_subscriptions_bulk(self, user_ids: List[str]) -> Dict[str, List[Subscription]]:
+        """Retrieve the subscriptions of several users, querying Firestore for up to 30 users at a time"""
+        subscriptions_by_user = {}
+        uncached_user_ids = []
+        for user_id in user_ids:
+            cached = self._get_cached_subscriptions(user_id)
+            if cached is not None:
+                subscriptions_by_user[user_id] = cached
+            else:
+                subscriptions_by_user[user_id] = []
+                uncached_user_ids.append(user_id)
+        
+        try:
+            # Firestore accepts at most 30 values in an 'in' filter
+            for start in range(0, len(uncached_user_ids), 30):
+                chunk = uncached_user_ids[start:start + 30]
+                query = (self.db.collection(self.subscriptions_collection)
+                         .where(filter=FieldFilter('user_id', 'in', chunk))
+                         .where(filter=FieldFilter('enabled', '==', True)))
+                for doc in query.stream():
+                    subscription = self._subscription_from_doc(doc)
+                    subscriptions_by_user[subscription.user_id].append(subscription)
+                
+                for user_id in chunk:
+                    self._cache_subscriptions(user_id, subscriptions_by_user[user_id])
+            
+        except Exception as e:
+            logger.error("Failed to get subscriptions for users",
+                        user_count=len(user_ids),
+                        error=str(e))
+        
+        return subscriptions_by_user
+
     # Backward compatibility method - returns first subscription
     def get_user_preference(self, user_id: str) -> Optional[UserPreference]:
         """Retrieve user preference (backward compatibility - returns first subscription)"""
@@ -503,10 +575,34 @@ class EventStore:
                         error=str(e))
             return []
 
-    def get_undelivered_events(self, limit: Optional[int] = None) -> Dict[str, List[Event]]:
-        """Get all undelivered events grouped by user_id"""
+    def _event_from_dict(self, data: Dict[str, Any]) -> Event:
+        """Convert a stored event document back into an Event"""
+        # Convert string back to EventType enum
+        try:
+            event_type_str = data.get('event_type', 'NOTIFICATION')
+            event_type_enum = EventType(event_type_str)
+        except ValueError:
+            logger.warning("Unknown event_type from Firestore, defaulting to NOTIFICATION", 
+                          event_type=event_type_str)
+            event_type_enum = EventType.NOTIFICATION
+
+        return Event(
+            event_id=data['event_id'],
+            user_id=data['user_id'],
+            event_type=event_type_enum,
+            message=data['message'],
+            sender=data.get('sender', ''),
+            subject=data.get('subject', ''),
+            timestamp=data['timestamp'],
+            metadata=data.get('metadata', {})
+        )
+
+    def get_undelivered_events(self, limit: Optional[int] = None, event_type: Optional[str] = None) -> Dict[str, List[Event]]:
+        """Get all undelivered events grouped by user_id, optionally only those of one event type"""
         try:
             query = self.db.collection(self.events_collection)
+            if event_type:
+                query = query.where(filter=FieldFilter('event_type', '==', event_type))
             if limit:
                 query = query.limit(limit)
             
@@ -517,25 +613,7 @@ class EventStore:
                 data = doc.to_dict()
                 user_id = data['user_id']
                 
-                # Convert string back to EventType enum
-                try:
-                    event_type_str = data.get('event_type', 'NOTIFICATION')
-                    event_type_enum = EventType(event_type_str)
-                except ValueError:
-                    logger.warning("Unknown event_type from Firestore, defaulting to NOTIFICATION", 
-                                  event_type=event_type_str)
-                    event_type_enum = EventType.NOTIFICATION
-                    
-                event = Event(
-                    event_id=data['event_id'],
-                    user_id=data['user_id'],
-                    event_type=event_type_enum,
-                    message=data['message'],
-                    sender=data.get('sender', ''),
-                    subject=data.get('subject', ''),
-                    timestamp=data['timestamp'],
-                    metadata=data.get('metadata', {})
-                )
+                event = self._event_from_dict(data)
                 
                 if user_id not in events_by_user:
                     events_by_user[user_id] = []
@@ -587,10 +665,57 @@ class EventStore:
             logger.error("Failed to get events for user", user_id=user_id, error=str(e))
             return []
 
+    def get_undelivered_events_page(self, page_size: int, cursor: Optional[str] = None,
+                                    user_id: Optional[str] = None, event_type: Optional[str] = None) -> Tuple[List[Event], Optional[str]]:
+        """Get one page of undelivered events in document ID order
+
+        Filtering by user and event type happens in the query, so every page is full until the last.
+        Returns the events and the cursor for the next page, or None once the matching events are exhausted.
+        """
+        try:
+            query = self.db.collection(self.events_collection)
+            if user_id:
+                query = query.where(filter=FieldFilter('user_id', '==', user_id))
+            if event_type:
+                query = query.where(filter=FieldFilter('event_type', '==', event_type))
+            query = query.order_by(FieldPath.document_id())
+            if cursor:
+                query = query.start_after({FieldPath.document_id(): cursor})
+
+            docs = list(query.limit(page_size).stream())
+            events = [self._event_from_dict(doc.to_dict()) for doc in docs]
+            next_cursor = docs[-1].id if len(docs) == page_size else None
+            return events, next_cursor
+
+        except Exception as e:
+            logger.error("Failed to get undelivered events page", cursor=cursor, user_id=user_id, error=str(e))
+            return [], None
+
     def get_undelivered_events_by_user(self, user_id: str) -> List[Event]:
         """Get undelivered events for a specific user"""
         return self.get_events_for_user(user_id)
 
+    def count_undelivered(self, user_id: Optional[str] = None) -> Tuple[int, int]:
+        """Count the users with undelivered events and the events themselves, without reading the events
+
+        Returns (user count, event count).
+        """
+        try:
+            if user_id:
+                # A count aggregation returns the number of events without transferring them
+                query = self.db.collection(self.events_collection).where(filter=FieldFilter('user_id', '==', user_id))
+                event_count = query.count().get()[0][0].value
+                return (1 if event_count else 0), event_count
+
+            # Users can only be counted from the documents, so read just their user_id field
+            docs = self.db.collection(self.events_collection).select(['user_id']).stream()
+            user_ids = [doc.get('user_id') for doc in docs]
+            return len(set(user_ids)), len(user_ids)
+
+        except Exception as e:
+            logger.error("Failed to count undelivered events", user_id=user_id, error=str(e))
+            raise
+
     def get_undelivered_stats(self) -> Dict[str, Any]:
         """Get statistics about undelivered messages"""
         try:
@@ -813,6 +938,41 @@ class EventStore:
                 'errors': [f"Flush operation failed: {str(e)}"]
             }
 
+    def get_event_by_id(self, event_id: str) -> Optional[Event]:
+        """Get a specific event by its ID, or None if it does not exist"""
+        try:
+            doc = self.db.collection(self.events_collection).document(event_id).get()
+            return self._event_from_dict(doc.to_dict()) if doc.exists else None
+            
+        except Exception as e:
+            logger.error("Failed to get event", event_id=event_id, error=str(e))
+            return None
+
+    def delete_event_if_owned(self, event_id: str, user_id: str) -> bool:
+        """Delete an event only if it belongs to the user, checking and deleting in one transaction
+
+        Returns False when the event does not exist or belongs to another user.
+        """
+        doc_ref = self.db.collection(self.events_collection).document(event_id)
+
+        @firestore.transactional
+        def delete_if_owned(transaction) -> bool:
+            doc = doc_ref.get(transaction=transaction)
+            if not doc.exists or doc.get('user_id') != user_id:
+                return False
+            transaction.delete(doc_ref)
+            return True
+
+        try:
+            deleted = delete_if_owned(self.db.transaction())
+            if deleted:
+                logger.info("Event deleted successfully", event_id=event_id, user_id=user_id)
+            return deleted
+            
+        except Exception as e:
+            logger.error("Failed to delete event", event_id=event_id, user_id=user_id, error=str(e))
+            raise
+
     def delete_event_by_id(self, event_id: str) -> bool:
         """Delete a specific event by its ID"""
         try:
@@ -911,6 +1071,7 @@ class EventStore:
                 return False
             
             doc_ref.delete()
+            self._invalidate_subscriptions(doc.to_dict()['user_id'])
             logger.info("Subscription deleted successfully", subscription_id=subscription_id)
             return True
             
@@ -1118,6 +1279,8 @@ class PubSubEventProcessor:
         self.subscriber = pubsub_v1.SubscriberClient()
         self.subscription_path = self.subscriber.subscription_path(project_id, subscription_name)
         self.aggregator = EventAggregator(event_store)
+        self.streaming_pull_future = None
+        self.max_outstanding_messages = int(os.environ.get('PUBSUB_MAX_OUTSTANDING_MESSAGES', '100'))
     
     def _safe_ack(self, message, event_id: str = None):
         """Safely acknowledge a message with error handling"""
@@ -1426,11 +1589,14 @@ class PubSubEventProcessor:
                    subscription_path=self.subscription_path,
                    project_id=self.project_id)
         
-        # Flow control settings
-        flow_control = pubsub_v1.types.FlowControl(max_messages=100)
+        # Bound the messages held in memory while callback threads work through them
+        flow_control = pubsub_v1.types.FlowControl(
+            max_messages=self.max_outstanding_messages,
+            max_bytes=10 * 1024 * 1024,
+        )
         
         # Start streaming pull
-        streaming_pull_future = self.subscriber.subscribe(
+        self.streaming_pull_future = streaming_pull_future = self.subscriber.subscribe(
             self.subscription_path,
             callback=self.process_message,
             flow_control=flow_control,
@@ -1439,11 +1605,18 @@ class PubSubEventProcessor:
         logger.info("Pub/Sub listener active",
                    subscription_path=self.subscription_path)
         
-        # Keep the main thread running
-        try:
-            streaming_pull_future.result()
-        except KeyboardInterrupt:
-            streaming_pull_future.cancel()
+        # Keep the main thread running; the subscriber's channel is closed once the stream ends
+        with self.subscriber:
+            try:
+                streaming_pull_future.result()
+            except KeyboardInterrupt:
+                streaming_pull_future.cancel()
+                logger.info("Pub/Sub subscription cancelled")
+    
+    def stop_listening(self):
+        """Cancel the streaming pull, letting start_listening return once in-flight messages are handled"""
+        if self.streaming_pull_future is not None:
+            self.streaming_pull_future.cancel()
             logger.info("Pub/Sub subscription cancelled")
 
 class ScheduledDeliveryService:
@@ -1571,7 +1744,8 @@ class EventAggregationSystem:
     """Main system orchestrator"""
     
     def __init__(self, project_id: str, subscription_name: str, database_id: str = "messaging"):
-        self.event_store = EventStore(project_id, database_id)
+        # Uncached: the processor's store lives in its own process, where API writes cannot invalidate it
+        self.event_store = EventStore(project_id, database_id, cache_subscriptions=False)
         self.delivery_service = DeliveryService()
         self.pubsub_processor = PubSubEventProcessor(
             project_id, subscription_name, self.event_store, self.delivery_service
@@ -1597,6 +1771,10 @@ class EventAggregationSystem:
         
         # Start Pub/Sub listener (blocking)
         self.pubsub_processor.start_listening()
+    
+    def stop(self):
+        """Stop listening for Pub/Sub messages, unblocking start()"""
+        self.pubsub_processor.stop_listening()
 
 # Example usage and testing
 if __name__ == "__main__":
@@ -34,9 +34,9 @@ if ! command -v python3 &> /dev/null; then
 fi
 
 # Check if required Python packages are available
-python3 -c "import requests, structlog" 2>/dev/null || {
+python3 -c "import h2, httpx, requests, starlette, structlog, uvicorn" 2>/dev/null || {
     echo "⚠️  Warning: Required Python packages not found. Installing..."
-    pip3 install requests structlog
+    pip3 install "httpx[http2]" requests starlette structlog uvicorn
 }
 
 # Check authentication
@@ -0,0 +1,198 @@
+"""
+Tests for the REST API
+"""
+
+import anyio
+import asyncio
+import pytest
+import threading
+from datetime import datetime, timezone
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+from src import api
+from src.api import app, get_event_store
+
+
+@pytest.fixture
+def event_store():
+    """Mocked EventStore injected into the API"""
+    store = MagicMock()
+    app.dependency_overrides[get_event_store] = lambda: store
+    yield store
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(event_store):
+    """Test client for the API"""
+    return TestClient(app)
+
+
+class TestListUndeliveredMessages:
+    """Test the admin listing of undelivered messages"""
+
+    def test_page_returns_next_cursor(self, client, event_store, sample_events):
+        """Test that a full page advertises the cursor for the next one"""
+        event_store.get_undelivered_events_page.return_value = (sample_events[:2], "event-2")
+
+        response = client.get("/undelivered", params={'page_size': 2, 'cursor': 'event-0'})
+
+        assert response.status_code == 200
+        assert response.headers['X-Next-Cursor'] == "event-2"
+        assert [e['event_id'] for e in response.json()] == [e.event_id for e in sample_events[:2]]
+        event_store.get_undelivered_events_page.assert_called_once_with(2, 'event-0', event_type=None)
+
+    def test_last_page_has_no_cursor(self, client, event_store, sample_events):
+        """Test that the final page omits the cursor header"""
+        event_store.get_undelivered_events_page.return_value = (sample_events[:1], None)
+
+        response = client.get("/undelivered", params={'page_size': 2})
+
+        assert response.status_code == 200
+        assert 'X-Next-Cursor' not in response.headers
+
+
+class TestGetUserMessages:
+    """Test the per-user listing of undelivered messages"""
+
+    def test_events_are_serialized_like_event_response(self, client, event_store, sample_events):
+        """Test that directly rendered events keep the EventResponse fields and formats"""
+        event_store.get_undelivered_events_by_user.return_value = sample_events[:2]
+
+        response = client.get("/users/user_123/messages", params={'event_type': 'alert'})
+
+        assert response.status_code == 200
+        assert response.json() == [{
+            'event_id': "event_2",
+            'user_id': "user_123",
+            'event_type': "ALERT",
+            'message': "Build completed successfully",
+            'sender': "build-system@arxiv.org",
+            'subject': "Build Status",
+            'timestamp': "2023-12-01T11:00:00",
+            'metadata': {"build_id": "12345"}
+        }]
+
+
+    def test_page_is_queried_per_user_and_type(self, client, event_store, sample_events):
+        """Test that paging a user's messages pushes the user and event type into the query"""
+        event_store.get_undelivered_events_page.return_value = (sample_events[1:2], "event_2")
+
+        response = client.get("/users/user_123/messages", params={'page_size': 1, 'event_type': 'alert'})
+
+        assert response.status_code == 200
+        assert response.headers['X-Next-Cursor'] == "event_2"
+        event_store.get_undelivered_events_page.assert_called_once_with(1, None, user_id="user_123", event_type="ALERT")
+
+    def test_utc_timestamps_keep_the_z_suffix(self, client, event_store, sample_events):
+        """Test that UTC timestamps, including Firestore's datetime subclass, render as before"""
+        event = sample_events[0]
+        event.timestamp = DatetimeWithNanoseconds(2023, 12, 1, 10, 0, 0, tzinfo=timezone.utc)
+        event.metadata = {"received": datetime(2023, 12, 1, 9, 0, 0, tzinfo=timezone.utc)}
+        event_store.get_undelivered_events_by_user.return_value = [event]
+
+        response = client.get("/users/user_123/messages")
+
+        assert response.json()[0]['timestamp'] == "2023-12-01T10:00:00Z"
+        assert response.json()[0]['metadata'] == {"received": "2023-12-01T09:00:00Z"}
+
+
+class TestGetUserMessage:
+    """Test looking up a single message"""
+
+    def test_message_is_fetched_by_id(self, client, event_store, sample_events):
+        """Test that the message is read directly rather than by listing the user's messages"""
+        event_store.get_event_by_id.return_value = sample_events[0]
+
+        response = client.get("/users/user_123/messages/event_1")
+
+        assert response.status_code == 200
+        assert response.json()['event_id'] == "event_1"
+        event_store.get_event_by_id.assert_called_once_with("event_1")
+        event_store.get_undelivered_events_by_user.assert_not_called()
+
+    def test_message_of_another_user_is_not_found(self, client, event_store, sample_events):
+        """Test that a message owned by a different user is reported as missing"""
+        event_store.get_event_by_id.return_value = sample_events[2]
+
+        response = client.get("/users/user_123/messages/event_3")
+
+        assert response.status_code == 404
+
+
+class TestDeleteUserMessage:
+    """Test deleting a single message"""
+
+    def test_message_is_deleted_with_ownership_check(self, client, event_store):
+        """Test that the ownership check and delete are left to a single store call"""
+        event_store.delete_event_if_owned.return_value = True
+
+        response = client.delete("/users/user_123/messages/event_1")
+
+        assert response.status_code == 200
+        event_store.delete_event_if_owned.assert_called_once_with("event_1", "user_123")
+        event_store.delete_event_by_id.assert_not_called()
+
+    def test_message_not_owned_is_not_found(self, client, event_store):
+        """Test that a missing or foreign message is reported as not found"""
+        event_store.delete_event_if_owned.return_value = False
+
+        response = client.delete("/users/user_123/messages/event_3")
+
+        assert response.status_code == 404
+
+class TestGetUserSubscriptions:
+    """Test listing a user's subscriptions"""
+
+    def test_enums_are_serialized_as_values(self, client, event_store, example_user_preferences):
+        """Test that subscription enums are rendered as their string values"""
+        event_store.get_user_subscriptions.return_value = example_user_preferences[:1]
+
+        response = client.get("/users/user_123/subscriptions")
+
+        assert response.status_code == 200
+        subscription = response.json()[0]
+        assert subscription['delivery_method'] == "email"
+        assert subscription['aggregation_frequency'] == "daily"
+        assert subscription['email_address'] == "user123@arxiv.org"
+        assert subscription['slack_webhook_url'] is None
+
+
+class TestGetEventStore:
+    """Test the EventStore dependency"""
+
+    def test_event_store_is_shared_across_requests(self, monkeypatch):
+        """Test that the Firestore-backed EventStore is created once and reused"""
+        monkeypatch.setenv('GCP_PROJECT_ID', 'test-project')
+        api._create_event_store.cache_clear()
+        with patch.object(api, 'EventStore') as event_store_class:
+            first = asyncio.run(get_event_store())
+            second = asyncio.run(get_event_store())
+        api._create_event_store.cache_clear()
+
+        assert first is second
+        event_store_class.assert_called_once_with('test-project', 'messaging')
+
+
+class TestHandlerThreadPool:
+    """Test the thread pool the synchronous handlers run in"""
+
+    def test_pool_is_sized_and_started_before_serving(self, event_store, example_user_preferences, monkeypatch):
+        """Test that start-up sizes the limiter from THREAD_POOL_SIZE and starts its threads"""
+        monkeypatch.setattr(api, 'THREAD_POOL_SIZE', 4)
+        handler_threads = []
+        event_store.get_user_subscriptions.side_effect = lambda user_id: (
+            handler_threads.append(threading.current_thread().name) or example_user_preferences[:1]
+        )
+
+        with TestClient(app) as client:
+            started = sum(t.name == "AnyIO worker thread" for t in threading.enumerate())
+            tokens = client.portal.call(lambda: anyio.to_thread.current_default_thread_limiter().total_tokens)
+            response = client.get("/users/user_123/subscriptions")
+
+        assert started >= 4
+        assert tokens == 4
+        assert response.status_code == 200
+        assert handler_threads == ["AnyIO worker thread"]
@@ -0,0 +1,158 @@
+"""
+Tests for EventStore Firestore queries
+"""
+
+import pytest
+from dataclasses import asdict
+from unittest.mock import MagicMock
+
+
+def make_doc(event):
+    data = asdict(event)
+    data['event_type'] = event.event_type.value
+    doc = MagicMock()
+    doc.id = event.event_id
+    doc.to_dict.return_value = data
+    return doc
+
+
+class TestUndeliveredEventsPage:
+    """Test cursor pagination over undelivered events"""
+
+    @pytest.fixture
+    def query(self, mock_event_store):
+        """Ordered events query the page is read from"""
+        return mock_event_store.db.collection.return_value.order_by.return_value
+
+    def test_full_page_returns_cursor(self, mock_event_store, query, sample_events):
+        """Test that a full page returns the last document ID as the next cursor"""
+        query.limit.return_value.stream.return_value = [make_doc(e) for e in sample_events[:2]]
+
+        events, cursor = mock_event_store.get_undelivered_events_page(2)
+
+        assert [e.event_id for e in events] == [e.event_id for e in sample_events[:2]]
+        assert cursor == sample_events[1].event_id
+        query.start_after.assert_not_called()
+
+    def test_short_page_ends_pagination(self, mock_event_store, query, sample_events):
+        """Test that resuming from a cursor and reading a short page ends pagination"""
+        resumed = query.start_after.return_value
+        resumed.limit.return_value.stream.return_value = [make_doc(sample_events[0])]
+
+        events, cursor = mock_event_store.get_undelivered_events_page(2, cursor="event_0")
+
+        assert len(events) == 1
+        assert cursor is None
+
+    def test_user_and_type_filters_are_applied_in_the_query(self, mock_event_store, sample_events):
+        """Test that user and event type filters are pushed into Firestore before ordering"""
+        collection = mock_event_store.db.collection.return_value
+        filtered = collection.where.return_value.where.return_value
+        filtered.order_by.return_value.limit.return_value.stream.return_value = [make_doc(sample_events[1])]
+
+        events, cursor = mock_event_store.get_undelivered_events_page(2, user_id="user_123", event_type="ALERT")
+
+        assert [e.event_id for e in events] == ["event_2"]
+        assert cursor is None
+        filters = [c.kwargs['filter'] for c in collection.where.call_args_list + collection.where.return_value.where.call_args_list]
+        assert [(f.field_path, f.value) for f in filters] == [('user_id', "user_123"), ('event_type', "ALERT")]
+
+
+class TestUserSubscriptionsCache:
+    """Test caching of a user's subscriptions"""
+
+    @pytest.fixture
+    def query(self, mock_event_store, example_user_preferences):
+        """Enabled-subscriptions query for a user"""
+        query = mock_event_store.db.collection.return_value.where.return_value.where.return_value
+        doc = MagicMock()
+        preference = example_user_preferences[0]
+        doc.to_dict.return_value = {
+            **asdict(preference),
+            'delivery_method': preference.delivery_method.value,
+            'aggregation_frequency': preference.aggregation_frequency.value,
+            'aggregation_method': preference.aggregation_method.value,
+            'delivery_error_strategy': preference.delivery_error_strategy.value
+        }
+        query.stream.return_value = [doc]
+        return query
+
+    def test_repeated_reads_use_the_cache(self, mock_event_store, query):
+        """Test that a second read is served from memory as an independent copy"""
+        first = mock_event_store.get_user_subscriptions("user_123")
+        first[0].enabled = False
+        second = mock_event_store.get_user_subscriptions("user_123")
+
+        assert query.stream.call_count == 1
+        assert second[0].enabled is True
+
+    def test_storing_a_subscription_invalidates_the_cache(self, mock_event_store, query):
+        """Test that storing a subscription makes the next read go back to Firestore"""
+        subscription = mock_event_store.get_user_subscriptions("user_123")[0]
+        mock_event_store.store_subscription(subscription)
+        mock_event_store.get_user_subscriptions("user_123")
+
+        assert query.stream.call_count == 2
+
+    def test_users_without_subscriptions_are_not_cached(self, mock_event_store, query):
+        """Test that an empty result is read again, so a new subscription applies at once"""
+        query.stream.return_value = []
+        mock_event_store.get_user_subscriptions("user_123")
+        mock_event_store.get_user_subscriptions("user_123")
+
+        assert query.stream.call_count == 2
+
+    def test_cache_can_be_turned_off(self, mock_event_store, query):
+        """Test that a store built without the cache reads Firestore every time"""
+        mock_event_store.cache_subscriptions = False
+        mock_event_store.get_user_subscriptions("user_123")
+        mock_event_store.get_user_subscriptions("user_123")
+
+        assert query.stream.call_count == 2
+
+    def test_bulk_read_queries_uncached_users_in_chunks(self, mock_event_store, query, example_user_preferences):
+        """Test that a bulk read skips cached users and queries the rest 30 at a time"""
+        mock_event_store.get_user_subscriptions("user_123")
+        query.stream.return_value = []
+        user_ids = ["user_123"] + [f"user_{i}" for i in range(31)]
+
+        subscriptions = mock_event_store.get_user_subscriptions_bulk(user_ids)
+
+        chunks = [c.kwargs['filter'].value for c in mock_event_store.db.collection.return_value.where.call_args_list[1:]]
+        assert [len(chunk) for chunk in chunks] == [30, 1]
+        assert "user_123" not in chunks[0]
+        assert len(subscriptions["user_123"]) == 1
+        assert subscriptions["user_30"] == []
+
+
+class TestCountUndelivered:
+    """Test counting undelivered events for flush dry runs"""
+
+    def test_user_count_uses_count_aggregation(self, mock_event_store):
+        """Test that a single user's events are counted by Firestore rather than read"""
+        query = mock_event_store.db.collection.return_value.where.return_value
+        query.count.return_value.get.return_value = [[MagicMock(value=3)]]
+
+        assert mock_event_store.count_undelivered("user_123") == (1, 3)
+        query.stream.assert_not_called()
+
+    def test_all_users_are_counted_from_user_ids_only(self, mock_event_store):
+        """Test that counting across users reads only the user_id field"""
+        projection = mock_event_store.db.collection.return_value.select.return_value
+        projection.stream.return_value = [MagicMock(get=MagicMock(return_value=u)) for u in ["a", "b", "a"]]
+
+        assert mock_event_store.count_undelivered() == (2, 3)
+        mock_event_store.db.collection.return_value.select.assert_called_once_with(['user_id'])
+
+
+class TestClearUserEvents:
+    """Test deleting a user's events"""
+
+    def test_clearing_without_a_time_deletes_every_event(self, mock_event_store, sample_events):
+        """Test that no timestamp bound is applied when no time is given"""
+        query = mock_event_store.db.collection.return_value.where.return_value
+        query.stream.return_value = [make_doc(e) for e in sample_events[:2]]
+
+        assert mock_event_store.clear_user_events("user_123") == 2
+        query.where.assert_not_called()
+        mock_event_store.db.batch.return_value.commit.assert_called_once()
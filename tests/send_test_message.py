@@ -4,14 +4,35 @@ Send a test message to Pub/Sub for the messaging service
 """
 
 import argparse
+import concurrent.futures
+import logging
 import os
 import sys
-import structlog
-from arxiv_messaging.send_notification import send_notification
+from typing import List, Optional
+from arxiv_messaging.send_notification import send_notification, send_bulk_notification, publish_bulk_notification
 from arxiv_messaging.event_type import EventType
 
+EVENT_TYPE_VALUES = tuple(et.value for et in EventType)
+
 def setup_logging():
-    """Configure structured logging"""
+    """Configure structured logging
+
+    Set ARXIV_MSG_QUIET=1 to drop log records below WARNING before any processor runs
+    and discard the rest, which keeps logging out of high-rate publish loops.
+    """
+    # Imported here so --help and argument errors do not pay for it
+    import structlog
+
+    if os.getenv('ARXIV_MSG_QUIET') == '1':
+        logging.getLogger().addHandler(logging.NullHandler())
+        structlog.configure(
+            processors=[structlog.processors.JSONRenderer()],
+            wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING),
+            logger_factory=structlog.stdlib.LoggerFactory(),
+            cache_logger_on_first_use=True,
+        )
+        return
+
     structlog.configure(
         processors=[
             structlog.stdlib.filter_by_level,
@@ -32,7 +53,8 @@ def setup_logging():
 def send_test_message(project_id: str, topic_name: str, user_id = None, email_to: str = None, 
                      subject: str = "test", message: str = "test message", 
                      event_type: str = "NOTIFICATION", sender: str = "no-reply@arxiv.org",
-                     count: int = 1):
+                     count: int = 1, batch_size: int = 100,
+                     await_each_batch: bool = True):
     """
     Send test message(s) to Pub/Sub topic using the send_notification function
     
@@ -46,59 +68,101 @@ def send_test_message(project_id: str, topic_name: str, user_id = None, email_to
         event_type: Event type (NOTIFICATION, ALERT, etc.)
         sender: Sender email address
         count: Number of copies to send (for testing aggregation)
+        batch_size: Number of copies published together before waiting for their results
+        await_each_batch: Wait for each batch to be confirmed before publishing the next;
+            when False all copies are published first and confirmations are collected at the end
     """
+    import structlog
+
     logger = structlog.get_logger(__name__)
+    # Progress and summary output is skipped along with logging in quiet mode
+    quiet = os.getenv('ARXIV_MSG_QUIET') == '1'
     
     try:
         message_ids = []
         
-        # Send multiple copies if count > 1
-        for i in range(count):
-            # Modify subject and message for multiple copies
-            current_subject = f"{subject} (#{i+1}/{count})" if count > 1 else subject
-            current_message = f"{message} [Copy {i+1} of {count}]" if count > 1 else message
-            
-            # Use the send_notification function with test metadata
-            message_id = send_notification(
+        if count == 1:
+            message_ids.append(send_notification(
                 user_id=user_id,
                 email_to=email_to,
-                subject=current_subject,
-                message=current_message,
+                subject=subject,
+                message=message,
                 sender=sender,
                 event_type=event_type,
-                metadata={
-                    "source": "test-script", 
-                    "test": True, 
-                    "copy_number": i + 1,
-                    "total_copies": count
-                },
+                metadata={"source": "test-script", "test": True, "copy_number": 1, "total_copies": 1},
+                project_id=project_id,
+                topic_name=topic_name,
+                logger=logger
+            ))
+
+        # Publish multiple copies in batches, waiting once per batch rather than once per copy
+        pending = []
+        for start in range(0, count if count > 1 else 0, batch_size):
+            notifications = [
+                {
+                    "user_id": user_id,
+                    "email_to": email_to,
+                    "subject": f"{subject} (#{i+1}/{count})",
+                    "message": f"{message} [Copy {i+1} of {count}]",
+                    "sender": sender,
+                    "event_type": event_type,
+                    "metadata": {
+                        "source": "test-script",
+                        "test": True,
+                        "copy_number": i + 1,
+                        "total_copies": count
+                    }
+                }
+                for i in range(start, min(start + batch_size, count))
+            ]
+            if not await_each_batch:
+                pending.extend(publish_bulk_notification(
+                    notifications,
+                    project_id=project_id,
+                    topic_name=topic_name,
+                    logger=logger
+                ))
+                continue
+            batch_ids = send_bulk_notification(
+                notifications,
                 project_id=project_id,
                 topic_name=topic_name,
                 logger=logger
             )
-            message_ids.append(message_id)
-            
-            if count > 1:
-                print(f"✅ Test message {i+1}/{count} sent! Message ID: {message_id}")
-        
+            if not quiet:
+                sys.stdout.write("".join(
+                    f"✅ Test message {i}/{count} sent! Message ID: {message_id}\n"
+                    for i, message_id in enumerate(batch_ids, start + 1)
+                ))
+            message_ids.extend(batch_ids)
+
+        # Collect confirmations only once everything has been handed to the publisher
+        if pending:
+            concurrent.futures.wait(pending)
+            failed = sum(1 for future in pending if future.exception() is not None)
+            if failed:
+                raise Exception(f"{failed} of {count} test messages failed to publish")
+            message_ids.extend(future.result() for future in pending)
+
+        if quiet:
+            return message_ids if count > 1 else message_ids[0]
+
+        # Build the summary first and write it in one call
         if count == 1:
-            print(f"✅ Test message sent successfully!")
-            print(f"   Message ID: {message_ids[0]}")
+            lines = ["✅ Test message sent successfully!", f"   Message ID: {message_ids[0]}"]
         else:
-            print(f"✅ All {count} test messages sent successfully!")
-            print(f"   Message IDs: {', '.join(message_ids)}")
+            lines = [f"✅ All {count} test messages sent successfully!", f"   Message IDs: {', '.join(message_ids)}"]
             
-        if user_id:
-            if isinstance(user_id, list):
-                print(f"   Users: {', '.join(user_id)} ({len(user_id)} total)")
-            else:
-                print(f"   User: {user_id}")
+        user_ids = user_id if isinstance(user_id, list) else ([user_id] if user_id else [])
+        if user_ids:
+            lines.append(f"   Users: {', '.join(user_ids)} ({len(user_ids)} total)")
         if email_to:
-            print(f"   Email: {email_to}")
-        print(f"   Subject: {subject}")
-        print(f"   Topic: {topic_name}")
+            lines.append(f"   Email: {email_to}")
+        lines.append(f"   Subject: {subject}")
+        lines.append(f"   Topic: {topic_name}")
         if count > 1:
-            print(f"   Count: {count} copies (for aggregation testing)")
+            lines.append(f"   Count: {count} copies (for aggregation testing)")
+        sys.stdout.write("\n".join(lines) + "\n")
         
         return message_ids if count > 1 else message_ids[0]
         
@@ -106,9 +170,13 @@ def send_test_message(project_id: str, topic_name: str, user_id = None, email_to
         print(f"❌ Failed to send test message: {e}")
         raise
 
+def _parse_user_ids(raw: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated --user-id value into user IDs"""
+    if not raw:
+        return None
+    return [u.strip() for u in raw.split(',')]
+
 def main():
-    setup_logging()
-    
     parser = argparse.ArgumentParser(description='Send test message to Pub/Sub')
     parser.add_argument('--project-id', 
                        default=os.getenv('GCP_PROJECT_ID', 'arxiv-development'),
@@ -128,7 +196,7 @@ def main():
                        help='Message content (default: test message)')
     parser.add_argument('--event-type', 
                        default='NOTIFICATION',
-                       choices=[et.value for et in EventType],
+                       choices=EVENT_TYPE_VALUES,
                        help='Event type (default: NOTIFICATION)')
     parser.add_argument('--sender', 
                        default='no-reply@arxiv.org',
@@ -137,22 +205,32 @@ def main():
                        type=int,
                        default=1,
                        help='Number of copies to send for testing aggregation (default: 1)')
+    parser.add_argument('--batch-size',
+                       type=int,
+                       default=100,
+                       help='Number of copies to publish before waiting for results (default: 100)')
+    parser.add_argument('--await',
+                       dest='await_each_batch',
+                       action=argparse.BooleanOptionalAction,
+                       default=None,
+                       help='Wait for each batch to be confirmed before publishing the next '
+                            '(default: --await for a single message, --no-await when --count > 1)')
     
     args = parser.parse_args()
+    setup_logging()
     
     # Validate that either user_id or email_to is provided
     if not args.user_id and not args.email_to:
         # Default to devnull for backward compatibility
         args.user_id = 'devnull'
     
-    # Parse user_id as comma-separated list if provided
-    user_id = None
-    if args.user_id:
-        if ',' in args.user_id:
-            user_id = [u.strip() for u in args.user_id.split(',')]
-        else:
-            user_id = args.user_id
+    # A single user is sent as a plain string, several as a list
+    user_ids = _parse_user_ids(args.user_id)
+    user_id = user_ids[0] if user_ids and len(user_ids) == 1 else user_ids
     
+    if args.await_each_batch is None:
+        args.await_each_batch = args.count <= 1
+
     try:
         send_test_message(
             project_id=args.project_id,
@@ -163,7 +241,9 @@ def main():
             message=args.message,
             event_type=args.event_type,
             sender=args.sender,
-            count=args.count
+            count=args.count,
+            batch_size=args.batch_size,
+            await_each_batch=args.await_each_batch
         )
     except Exception as e:
         sys.exit(1)
@@ -0,0 +1,197 @@
+"""
+Tests for the Firestore subscriber loader
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from ruamel.yaml import YAML
+
+from arxiv_messaging import FirebaseLoader
+
+
+def make_subscriber(index):
+    return {
+        'user_id': f"user_{index}",
+        'delivery_method': 'email',
+        'aggregation_frequency': 'daily',
+        'aggregation_method': 'plain',
+        'email_address': f"user{index}@arxiv.org"
+    }
+
+
+class FakePagedQuery:
+    """Minimal stand-in for an async Firestore query supporting limit/start_after"""
+
+    def __init__(self, docs, page_size, start=0):
+        self.docs = docs
+        self.page_size = page_size
+        self.start = start
+
+    def start_after(self, doc):
+        return FakePagedQuery(self.docs, self.page_size, self.docs.index(doc) + 1)
+
+    async def stream(self):
+        for doc in self.docs[self.start:self.start + self.page_size]:
+            yield doc
+
+
+class FakeBulkWriter:
+    """Stand-in for a Firestore BulkWriter that reports every operation as successful"""
+
+    def __init__(self):
+        self.deleted = []
+        self.written = []
+        self._on_write_result = None
+
+    def on_write_result(self, callback):
+        self._on_write_result = callback
+
+    def delete(self, reference):
+        self.deleted.append(reference)
+        self._on_write_result(reference, MagicMock(), self)
+
+    def set(self, reference, data):
+        self.written.append(reference)
+        self._on_write_result(reference, MagicMock(), self)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def loader():
+    """FirebaseLoader with a mocked Firestore client"""
+    loader = FirebaseLoader.__new__(FirebaseLoader)
+    loader.project_id = "test-project"
+    loader.yaml_file = "subscribers.yaml"
+    loader.database_id = "messaging"
+    loader.yaml = YAML(typ='safe')
+    loader.db = MagicMock()
+    return loader
+
+
+class TestLoadToFirestore:
+    """Test loading subscribers from YAML into Firestore"""
+
+    def test_writes_are_batched(self, loader):
+        """Test that subscribers are committed in batches rather than one write per document"""
+        subscribers = [make_subscriber(i) for i in range(FirebaseLoader.BATCH_SIZE + 10)]
+        loader.load_yaml = MagicMock(return_value=subscribers)
+
+        loaded = loader.load_to_firestore()
+
+        assert loaded == len(subscribers)
+        batch = loader.db.batch.return_value
+        assert batch.set.call_count == len(subscribers)
+        assert batch.commit.call_count == 2
+
+    def test_invalid_subscriber_is_skipped(self, loader):
+        """Test that a subscriber failing validation does not abort the load"""
+        subscribers = [make_subscriber(0), {'user_id': 'broken'}]
+        loader.load_yaml = MagicMock(return_value=subscribers)
+
+        loaded = loader.load_to_firestore()
+
+        assert loaded == 1
+
+    def test_failed_commit_is_not_counted(self, loader):
+        """Test that documents in a failed batch are not reported as loaded"""
+        loader.load_yaml = MagicMock(return_value=[make_subscriber(0)])
+        loader.db.batch.return_value.commit.side_effect = Exception("unavailable")
+
+        loaded = loader.load_to_firestore()
+
+        assert loaded == 0
+
+    def test_null_subscription_id_is_generated(self, loader):
+        """Test that an explicit null subscription_id gets the same derived ID as a missing one"""
+        loader.load_yaml = MagicMock(return_value=[{**make_subscriber(0), 'subscription_id': None}])
+
+        loader.load_to_firestore()
+
+        loader.db.collection.return_value.document.assert_called_once_with("user_0-email")
+
+
+class TestUnloadFromFirestore:
+    """Test reading subscriptions back out of Firestore"""
+
+    @pytest.mark.parametrize("doc_count", [0, 3, 4, 9])
+    def test_iter_docs_pages_through_collection(self, loader, doc_count):
+        """Test that keyset pagination yields every document exactly once"""
+        docs = [f"doc-{i}" for i in range(doc_count)]
+        client = MagicMock()
+        client.collection.return_value.order_by.return_value.limit.side_effect = (
+            lambda page_size: FakePagedQuery(docs, page_size)
+        )
+
+        async def collect():
+            return [doc async for doc in loader._iter_docs(client, page_size=3)]
+
+        assert asyncio.run(collect()) == docs
+
+    def test_async_client_is_closed_after_unload(self, loader):
+        """Test that the per-call async client releases its gRPC channel once streaming ends"""
+        client = MagicMock()
+        client.collection.return_value.order_by.return_value.limit.side_effect = (
+            lambda page_size: FakePagedQuery([], page_size)
+        )
+        client._firestore_api.transport.close = AsyncMock()
+
+        with patch('google.cloud.firestore.AsyncClient', return_value=client):
+            assert loader.unload_from_firestore(save_to_yaml=False) == []
+
+        client.close.assert_called_once()
+        client._firestore_api.transport.close.assert_awaited_once()
+
+    def test_async_client_uses_the_token_cache_when_enabled(self, loader, monkeypatch):
+        """Test that unloading passes the cached credentials to the async client when opted in"""
+        monkeypatch.setenv('ARXIV_MESSAGING_TOKEN_CACHE', '1')
+        client = MagicMock()
+        client.collection.return_value.order_by.return_value.limit.side_effect = (
+            lambda page_size: FakePagedQuery([], page_size)
+        )
+        client._firestore_api.transport.close = AsyncMock()
+        credentials = MagicMock()
+
+        with patch('arxiv_messaging.firebase_loader._get_cached_credentials', return_value=credentials), \
+                patch('google.cloud.firestore.AsyncClient', return_value=client) as client_class:
+            loader.unload_from_firestore(save_to_yaml=False)
+
+        client_class.assert_called_once_with(project="test-project", database="messaging", credentials=credentials)
+
+
+class TestSyncYamlToFirestore:
+    """Test syncing the YAML file into Firestore"""
+
+    def test_only_removed_subscriptions_are_deleted(self, loader):
+        """Test that sync deletes stale documents and overwrites the rest"""
+        loader.load_yaml = MagicMock(return_value=[make_subscriber(0), make_subscriber(1)])
+        existing = []
+        for subscription_id in ("user_0-email", "stale-email"):
+            doc_ref = MagicMock()
+            doc_ref.id = subscription_id
+            existing.append(doc_ref)
+        collection_ref = loader.db.collection.return_value
+        collection_ref.list_documents.return_value = existing
+        collection_ref.document.side_effect = lambda subscription_id: MagicMock(id=subscription_id)
+        bulk_writer = FakeBulkWriter()
+        loader.db.bulk_writer.return_value = bulk_writer
+
+        result = loader.sync_yaml_to_firestore()
+
+        assert result == {'deleted': 1, 'loaded': 2}
+        assert [ref.id for ref in bulk_writer.deleted] == ["stale-email"]
+        assert len(bulk_writer.written) == 2
+
+
+class TestClearFirestore:
+    """Test clearing subscriptions from Firestore"""
+
+    def test_counts_successful_deletes(self, loader):
+        """Test that the deleted count comes from BulkWriter results"""
+        doc_refs = [MagicMock(id=f"user_{i}-email") for i in range(3)]
+        loader.db.collection.return_value.list_documents.return_value = doc_refs
+        loader.db.bulk_writer.return_value = FakeBulkWriter()
+
+        assert loader.clear_firestore() == 3
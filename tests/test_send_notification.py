@@ -0,0 +1,129 @@
+"""
+Tests for publishing notifications to Pub/Sub
+"""
+
+import importlib
+import json
+import pytest
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+
+from arxiv_messaging import send_notification, send_bulk_notification, publish_bulk_notification
+
+# The package re-exports the send_notification function under the module's name
+send_notification_module = importlib.import_module('arxiv_messaging.send_notification')
+
+
+def resolved_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+@pytest.fixture
+def publisher():
+    """Mocked Pub/Sub publisher returned by the cached publisher factory"""
+    send_notification_module._get_publisher.cache_clear()
+    publisher = MagicMock()
+    publisher.topic_path.side_effect = lambda project_id, topic_name: f"projects/{project_id}/topics/{topic_name}"
+    publisher.publish.side_effect = lambda topic_path, data, **kwargs: resolved_future(f"msg-{publisher.publish.call_count}")
+    with patch.object(send_notification_module, '_create_publisher', return_value=publisher) as create_publisher, \
+            patch.object(send_notification_module.atexit, 'register'):
+        publisher.create_publisher = create_publisher
+        yield publisher
+    send_notification_module._get_publisher.cache_clear()
+
+
+class TestSendNotification:
+    """Test single and bulk notification publishing"""
+
+    def test_publisher_is_reused_across_calls(self, publisher):
+        """Test that repeated sends to the same topic share one publisher client"""
+        send_notification("subject", "message", user_id="user_123", project_id="test-project")
+        send_notification("subject", "message", user_id="user_456", project_id="test-project")
+
+        assert publisher.create_publisher.call_count == 1
+        assert publisher.publish.call_count == 2
+
+    def test_published_data_is_event_json(self, publisher):
+        """Test that the published payload is the JSON-encoded event"""
+        send_notification("subject", "message", user_id="user_123", event_type="ALERT",
+                          metadata={"count": 2}, project_id="test-project")
+
+        event = json.loads(publisher.publish.call_args.args[1])
+        assert event["user_id"] == "user_123"
+        assert event["event_type"] == "ALERT"
+        assert event["metadata"] == {"count": 2}
+
+    def test_bulk_returns_message_ids_in_order(self, publisher):
+        """Test that bulk sends publish every notification and return IDs in order"""
+        notifications = [{"subject": f"s{i}", "message": "m", "user_id": "user_123"} for i in range(3)]
+
+        message_ids = send_bulk_notification(notifications, project_id="test-project")
+
+        assert message_ids == ["msg-1", "msg-2", "msg-3"]
+
+    def test_bulk_raises_when_a_publish_fails(self, publisher):
+        """Test that a single failed publish fails the whole bulk send"""
+        failed = Future()
+        failed.set_exception(RuntimeError("unavailable"))
+        publisher.publish.side_effect = [resolved_future("msg-1"), failed]
+        notifications = [{"subject": "s", "message": "m", "user_id": "user_123"}] * 2
+
+        with pytest.raises(Exception, match="Failed to publish 1 of 2"):
+            send_bulk_notification(notifications, project_id="test-project")
+
+    def test_bulk_falls_back_to_rest_for_failed_publishes(self, publisher, tmp_path, monkeypatch):
+        """Test that only the messages the client failed to publish are resent through the REST API"""
+        credentials_path = tmp_path / "credentials.json"
+        credentials_path.write_text("{}")
+        monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", str(credentials_path))
+        failed = Future()
+        failed.set_exception(RuntimeError("unavailable"))
+        publisher.publish.side_effect = [resolved_future("msg-1"), failed]
+        notifications = [{"subject": f"s{i}", "message": "m", "user_id": "user_123"} for i in range(2)]
+
+        with patch.object(send_notification_module, '_send_bulk_via_rest_api', return_value=["rest-1"]) as send_rest:
+            message_ids = send_bulk_notification(notifications, project_id="test-project")
+
+        assert message_ids == ["msg-1", "rest-1"]
+        resent = send_rest.call_args.args[2]
+        assert [json.loads(m)["subject"] for m in resent] == ["s1"]
+
+    def test_rest_fallback_batches_messages_per_request(self):
+        """Test that REST API publishes are split into requests of at most 1000 messages"""
+        session = MagicMock()
+        session.post.return_value.json.side_effect = lambda: {
+            "messageIds": [f"id-{i}" for i in range(len(session.post.call_args.kwargs["json"]["messages"]))]
+        }
+        with patch.object(send_notification_module, '_get_access_token', return_value="token"), \
+                patch.object(send_notification_module, '_get_rest_session', return_value=session):
+            message_ids = send_notification_module._send_bulk_via_rest_api(
+                "test-project", "topic", [b"{}"] * 1001, "credentials.json"
+            )
+
+        assert session.post.call_count == 2
+        assert len(message_ids) == 1001
+
+    def test_rest_fallback_returns_none_without_message_ids(self):
+        """Test that a REST response carrying no message IDs yields None rather than failing"""
+        session = MagicMock()
+        session.post.return_value.json.return_value = {}
+        with patch.object(send_notification_module, '_get_access_token', return_value="token"), \
+                patch.object(send_notification_module, '_get_rest_session', return_value=session):
+            message_id = send_notification_module._send_via_rest_api(
+                "test-project", "topic", b"{}", "credentials.json"
+            )
+
+        assert message_id is None
+
+    def test_publish_returns_futures_and_logs_results(self, publisher):
+        """Test that asynchronous publishing hands back futures and logs each result as it arrives"""
+        logger = MagicMock()
+        notifications = [{"subject": "s", "message": "m", "user_id": "user_123"}] * 2
+
+        futures = publish_bulk_notification(notifications, project_id="test-project", logger=logger)
+
+        assert [future.result() for future in futures] == ["msg-1", "msg-2"]
+        published = [c for c in logger.info.call_args_list if c.args[0].startswith("Notification published")]
+        assert len(published) == 2